@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# 🚨 Per-participant anomaly detection
+# -------------------------------
+# Each participant's daily Steps, Calories and DistanceInMeters are compared
+# with a robust baseline of their own preceding 14 days: a trailing rolling
+# median and a rolling median absolute deviation (MAD).  The modified z-score
+# 0.6745 * (x - median) / MAD flags a day when |z| > Z_THRESHOLD.  Rows the
+# source already labels in AnomalyType are kept as anomalies too.
+#
+# The statistics are computed for the whole dataset in one grouped, windowed
+# pass when the dataset is prepared, and cached with it; the dashboard only
+# slices the resulting flags for the current filters.
+
+ANOMALY_METRICS = ["Steps", "Calories", "DistanceInMeters"]
+WINDOW = 14  # days
+MIN_PERIODS = 7
+Z_THRESHOLD = 3.5
+MAD_SCALE = 0.6745
+
+
+def detect(frame):
+    """Anomaly flags for ``frame``, one row per frame row in the same order.
+
+    Columns: ``<metric>_z`` for each metric, ``AnomalyLabel`` (the source
+    AnomalyType, else e.g. "High Steps" / "Low Calories", else missing) and
+    ``IsAnomaly``.  Each participant's rows are first summed per RecordDate,
+    so the baseline is the WINDOW calendar days before the day being scored
+    however many rows a day has or how many days are missing; every row of a
+    day gets that day's z-scores.  The MAD is taken as the rolling median of
+    each day's deviation from its own baseline median, which keeps the whole
+    computation vectorised.
+    """
+    participants = pd.factorize(frame["ParticipantName"])[0]
+    grouped = frame[ANOMALY_METRICS].astype(float).groupby([participants, frame["RecordDate"].dt.normalize().to_numpy()])
+    daily = grouped.sum(min_count=1)
+    days = daily.index.get_level_values(1)
+    keys = daily.index.get_level_values(0)
+
+    median = _rolling_median(daily, keys, days)
+    mad = _rolling_median((daily - median).abs(), keys, days)
+    z_daily = (MAD_SCALE * (daily - median) / mad.where(mad > 0)).to_numpy()
+
+    # Rows without a RecordDate belong to no day and aren't scored
+    row_day = grouped.ngroup().to_numpy(dtype=float)
+    z = np.full((len(frame), len(ANOMALY_METRICS)), np.nan)
+    dated = ~np.isnan(row_day)
+    z[dated] = z_daily[row_day[dated].astype(np.int64)]
+    flags = pd.DataFrame(z, columns=[f"{metric}_z" for metric in ANOMALY_METRICS])
+    flags["AnomalyLabel"] = _labels(z, frame)
+    flags["IsAnomaly"] = flags["AnomalyLabel"].notna()
+    return flags
+
+
+def _rolling_median(daily, keys, days):
+    # The WINDOW days strictly before each day, per participant; ``daily`` is
+    # sorted by (participant, day), which is also the order the result comes back in
+    rolled = (daily.reset_index(drop=True).assign(_day=days, _key=keys)
+              .groupby("_key")
+              .rolling(f"{WINDOW}D", on="_day", closed="left", min_periods=MIN_PERIODS)[ANOMALY_METRICS]
+              .median())
+    return rolled.set_axis(daily.index)
+
+
+def _labels(z, frame):
+    abs_z = np.nan_to_num(np.abs(z), nan=0.0)
+    strongest = abs_z.argmax(axis=1)
+    rows = np.arange(len(z))
+    detected = abs_z[rows, strongest] > Z_THRESHOLD
+    direction = np.where(z[rows, strongest] > 0, "High ", "Low ")
+    metric = np.array(ANOMALY_METRICS, dtype=object)[strongest]
+    labels = pd.Series(np.where(detected, direction + metric, None), dtype=object)
+    if "AnomalyType" in frame.columns:
+        source = frame["AnomalyType"].astype(object).reset_index(drop=True)
+        labels = source.where(source.notna(), labels)
+    return labels
+
+
+def updated(previous, keep, frame, changed_participants):
+    """Flags for ``frame`` (= old frame[keep] + delta rows) recomputing only ``changed_participants``.
+
+    Rolling baselines are per participant, so participants without new or
+    removed rows keep their previous flags.
+    """
+    flags = previous[keep].reset_index(drop=True).reindex(range(len(frame)))
+    positions = np.flatnonzero(frame["ParticipantName"].isin(changed_participants).to_numpy())
+    if len(positions):
+        recomputed = detect(frame.iloc[positions])
+        for col in recomputed.columns.drop("IsAnomaly"):
+            column = flags[col].to_numpy(dtype=recomputed[col].dtype, copy=True)
+            column[positions] = recomputed[col].to_numpy()
+            flags[col] = pd.Series(column, dtype=recomputed[col].dtype)
+    flags["IsAnomaly"] = flags["AnomalyLabel"].notna()
+    return flags
+
+
+def for_selection(dataset, filters, columns=()):
+    """The cached flags plus RecordDate, ParticipantName and ``columns`` for the rows matching ``filters``."""
+    rows = dataset.filter_index.select(filters)
+    flags = dataset.anomalies if rows is None else dataset.anomalies.iloc[rows]
+    frame = dataset.filter_index.take(dataset.frame, rows)
+    extra = ["RecordDate", "ParticipantName"] + [col for col in columns if col not in ("RecordDate", "ParticipantName")]
+    return flags.assign(**{col: frame[col].to_numpy() for col in extra})
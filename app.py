@@ -1,13 +1,48 @@
 import streamlit as st
 import dashboard_sleep
 import dashboard_steps
+import drilldown
+import filter_state
+import loader
+import participants
+import perf
+import perf_panel
+
+# Start loading both datasets in the background.  Streamlit has no server-start hook, so this
+# happens on the first run of this script in the process; later runs are no-ops.
+loader.warm()
+
+# The dataset each page needs before it can render
+PAGE_DATASETS = {"Steps Dashboard": "activity", "Sleep Dashboard": "sleep"}
 
 # Sidebar Navigation
 st.sidebar.title("Navigation")
 selected_dashboard = st.sidebar.radio("Go to:", ["Steps Dashboard", "Sleep Dashboard"])
+show_perf_panel = st.sidebar.checkbox("Show performance panel", value=False)
+# Chart payload sizes are only measured while the panel is open
+perf.measure_payloads(show_perf_panel)
+
+# Filters are drawn once for both dashboards and resolved against the shared participant master table,
+# so switching pages keeps the selection and reuses its resolution.  On a cold start only the open
+# page's dataset is waited for; the master picks up the other one on a later run once it has loaded.
+master = participants.current(required=[PAGE_DATASETS[selected_dashboard]])
+if master is None:
+    st.error("Failed to load data from S3.")
+    st.stop()
+selection = filter_state.sidebar(master)
+
+# With a single participant selected, the drilldown view serves both datasets from the per-participant store
+drilldown_mode = "ParticipantName" in selection.filters and st.sidebar.toggle("Participant drilldown", value=True)
 
 # Load selected dashboard
-if selected_dashboard == "Steps Dashboard":
-    dashboard_steps.main()
-elif selected_dashboard == "Sleep Dashboard":
-    dashboard_sleep.main()
\ No newline at end of file
+with perf.span("page", page="Participant Drilldown" if drilldown_mode else selected_dashboard):
+    if drilldown_mode:
+        drilldown.main(selection)
+    elif selected_dashboard == "Steps Dashboard":
+        dashboard_steps.main(selection)
+    elif selected_dashboard == "Sleep Dashboard":
+        dashboard_sleep.main(selection)
+
+# Drawn last so it includes the timings of this run
+if show_perf_panel:
+    perf_panel.render()
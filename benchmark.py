@@ -0,0 +1,304 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import charts
+import dashboard_sleep
+import dashboard_steps
+import data_cache
+import datasets
+import figures
+import filter_state
+import participants
+import query_engine
+import scatter
+
+# -------------------------------
+# ⏱️ Headless performance benchmark
+# -------------------------------
+# Generates synthetic activity and sleep sources with the real workbook schema
+# and times every stage the dashboards go through, without a browser:
+#
+#   load     ingest the source into the Parquet cache, then a warm cached load; up to
+#            XLSX_MAX_ROWS rows the same source is also ingested from a workbook,
+#            the openpyxl path a cold start takes
+#   prep     prepare_activity / prepare_sleep and each derived structure, with the
+#            rollup cube sizes (cells, and cells per row)
+#   filter   the participant master table, then resolving each cascading sidebar filter
+#            (option lists and matching master rows) in filter_state order
+#   chart    each chart's aggregation, and its serialisation (plotly JSON / PNG) with the payload size
+#
+# Results are written as JSON records keyed on (dashboard, rows, stage, step),
+# so runs from different commits can be diffed for regressions:
+#
+#   python benchmark.py --sizes 10k 100k --output bench.json
+#   python benchmark.py --sizes 1M --engine duckdb
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+DEFAULT_SIZES = ["10k", "100k", "1M"]
+DAYS_PER_PARTICIPANT = 90
+XLSX_MAX_ROWS = 100_000  # writing larger workbooks takes longer than the rest of the run
+
+ORGANIZATIONS = [f"Organization {i}" for i in range(8)]
+COHORTS_PER_ORG = 3
+PHYSICIANS_PER_ORG = 4
+PROGRAMS = ["Walking", "Sleep Hygiene", "Weight Management", "Cardio"]
+GENDERS = ["Male", "Female", "Other"]
+AGE_GROUPS = ["18-30", "31-45", "46-60", "60+"]
+ETHNICITIES = ["Asian", "Black", "Hispanic", "White", "Other"]
+CITIES = [f"City {i}" for i in range(20)]
+ANOMALY_TYPES = ["Spike", "Drop"]
+
+def _chart_units(specs):
+    """(chart id, builder, matplotlib draw function or None for plotly, figsize) for each unit main() renders."""
+    units = []
+    for chart in specs:
+        if chart.draw is not None:
+            units.append((chart.chart_id, chart.data, chart.draw, chart.figsize))
+        elif isinstance(chart.query, charts.RowQuery):
+            # Row-level scatters are rendered once per render mode
+            units += [(f"{chart.chart_id}:{mode}", lambda dataset, filters, chart=chart, mode=mode: chart.build(dataset, filters, mode), None, None)
+                      for mode in scatter.MODES]
+        else:
+            units.append((chart.chart_id, chart.build, None, None))
+    return units
+
+CHARTS = {
+    "activity": _chart_units(dashboard_steps.CHARTS),
+    "sleep": _chart_units(dashboard_sleep.CHARTS),
+}
+
+PREPARE = {"activity": datasets.prepare_activity, "sleep": datasets.prepare_sleep}
+
+
+def _labels(values, codes):
+    return pd.Categorical.from_codes(codes, categories=values)
+
+
+def _participants(n, rng):
+    """Participant attributes for ``n`` participants, as categoricals (cheap to generate at 10M rows)."""
+    ids = [str(i) for i in range(n)]
+    org = rng.integers(0, len(ORGANIZATIONS), n)
+    return {
+        "FirstName": _labels([f"First{i}" for i in ids], np.arange(n)),
+        "LastName": _labels([f"Last{i}" for i in ids], np.arange(n)),
+        "OrganizationName": _labels(ORGANIZATIONS, org),
+        "CohortName": _labels([f"{o} Cohort {c}" for o in ORGANIZATIONS for c in range(COHORTS_PER_ORG)],
+                              org * COHORTS_PER_ORG + rng.integers(0, COHORTS_PER_ORG, n)),
+        "ProgramName": _labels(PROGRAMS, rng.integers(0, len(PROGRAMS), n)),
+        "PhysicianName": _labels([f"Dr. {o} {p}" for o in ORGANIZATIONS for p in range(PHYSICIANS_PER_ORG)],
+                                 org * PHYSICIANS_PER_ORG + rng.integers(0, PHYSICIANS_PER_ORG, n)),
+        "PhysicianPhoto": _labels(["''"], np.zeros(n, dtype=int)),
+        "ParticipantPhotoURL": _labels(["''"], np.zeros(n, dtype=int)),
+        "ParticipantGender": _labels(GENDERS, rng.integers(0, len(GENDERS), n)),
+        "AgeGroup": _labels(AGE_GROUPS, rng.integers(0, len(AGE_GROUPS), n)),
+        "Ethnicity": _labels(ETHNICITIES, rng.integers(0, len(ETHNICITIES), n)),
+        "City": _labels(CITIES, rng.integers(0, len(CITIES), n)),
+        "Race": _labels(ETHNICITIES, rng.integers(0, len(ETHNICITIES), n)),
+        "Country": _labels(["United States"], np.zeros(n, dtype=int)),
+    }
+
+
+def _daily_rows(rows, seed):
+    """Participant columns repeated over consecutive days, plus the day offsets."""
+    rng = np.random.default_rng(seed)
+    n_participants = max(1, -(-rows // DAYS_PER_PARTICIPANT))
+    participant = np.arange(rows) // DAYS_PER_PARTICIPANT
+    day = np.arange(rows) % DAYS_PER_PARTICIPANT
+    frame = pd.DataFrame({col: values[participant] for col, values in _participants(n_participants, rng).items()})
+    dates = pd.date_range("2024-01-01", periods=DAYS_PER_PARTICIPANT)
+    frame["RecordDate"] = _labels(list(dates.strftime("%Y-%m-%d")), day)
+    return frame, dates[day], rng
+
+
+def synthetic_activity(rows, seed=0):
+    """A raw activity source frame with ``rows`` rows and the workbook's columns."""
+    frame, dates, rng = _daily_rows(rows, seed)
+    frame["StartTimeOffsetFormatted"] = dates + pd.to_timedelta(rng.integers(0, 86_400, rows), unit="s")
+    frame["Steps"] = rng.gamma(4.0, 2_000.0, rows).astype(int)
+    frame["DistanceInMeters"] = frame["Steps"] * rng.normal(0.75, 0.05, rows)
+    frame["Calories"] = 1_500 + frame["Steps"] * rng.normal(0.04, 0.005, rows)
+    for col in datasets.INTENSITY_COLS:
+        frame[col] = rng.integers(0, 7_200, rows)
+    anomaly = rng.random(rows) < 0.02
+    frame["AnomalyType"] = pd.Categorical.from_codes(
+        np.where(anomaly, rng.integers(0, len(ANOMALY_TYPES), rows), -1), categories=ANOMALY_TYPES)
+    return frame
+
+
+def synthetic_sleep(rows, seed=1):
+    """A raw sleep source frame with ``rows`` rows and the workbook's columns."""
+    frame, dates, rng = _daily_rows(rows, seed)
+    frame["Start"] = (dates + pd.to_timedelta(rng.integers(20 * 3_600, 25 * 3_600, rows), unit="s")).strftime(
+        "%Y-%m-%d %H:%M:%S")
+    for col in datasets.SLEEP_STAGE_COLS:
+        frame[col] = rng.integers(600, 10_000, rows)
+    frame["DurationAsleep"] = frame["DeepSleep"] + frame["LightSleep"] + frame["RemSleep"]
+    frame["TimeSpent"] = frame["DurationAsleep"] + frame["AwakeTime"]
+    frame["DurationInSeconds"] = frame["TimeSpent"]
+    return frame
+
+
+SYNTHETIC = {"activity": synthetic_activity, "sleep": synthetic_sleep}
+
+
+class Recorder:
+    """Collects one JSON record per timed step."""
+
+    def __init__(self, repeat=1):
+        self.repeat = repeat
+        self.records = []
+        self.context = {}
+
+    def time(self, stage, step, func, repeat=False, **extra):
+        """Run ``func()`` (``repeat`` times if asked), record the fastest run and return its result."""
+        timings = []
+        for _ in range(self.repeat if repeat else 1):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+        self.records.append(dict(self.context, stage=stage, step=step, seconds=min(timings),
+                                 median_seconds=statistics.median(timings), runs=len(timings), **extra))
+        return result
+
+    def note(self, **extra):
+        """Attach extra fields (sizes, row counts) to the last record."""
+        self.records[-1].update(extra)
+
+
+def _serialise(chart_id, result, draw, figsize):
+    if draw is not None:
+        return figures.render_png(f"benchmark:{chart_id}", result, draw, figsize)
+    return result.to_json().encode()
+
+
+def _master(dataset):
+    master = participants.build([dataset])
+    master.filter_index
+    return master
+
+
+def _cascade(recorder, dataset, chain):
+    """Time the participant master table and resolving each sidebar filter in order, selecting its first option.
+
+    Returns the filter states the charts are timed under.
+    """
+    master = recorder.time("filter", "participant_master", lambda: _master(dataset))
+    recorder.note(master_rows=len(master.frame))
+
+    def resolve(filters):
+        master.__dict__.pop("_resolutions", None)  # time the resolution itself, not the memo
+        return master.resolve(filters, chain)
+
+    filters, states = {}, {"all": {}}
+    resolution = recorder.time("filter", "resolve:all", lambda: resolve(filters), repeat=True)
+    recorder.note(master_rows=len(resolution.rows))
+    for column, _ in chain:
+        options = resolution.options[column]
+        if not options:
+            break
+        filters[column] = options[0]
+        resolution = recorder.time("filter", f"resolve:{column}", lambda: resolve(filters), repeat=True)
+        recorder.note(options=len(options), master_rows=len(resolution.rows))
+        if len(filters) == 1:
+            states["first_filter"] = dict(filters)
+    states["all_filters"] = dict(filters)
+    return states
+
+
+def _charts(recorder, dataset, name, states):
+    for state, filters in states.items():
+        for chart_id, build, draw, figsize in CHARTS[name]:
+            step = f"{chart_id}@{state}"
+            result = recorder.time("chart", f"aggregate:{step}", lambda: build(dataset, filters), repeat=True)
+            if result is None:
+                continue
+            payload = recorder.time("chart", f"serialise:{step}", lambda: _serialise(step, result, draw, figsize))
+            recorder.note(payload_bytes=len(payload), format="png" if draw is not None else "plotly-json")
+
+
+def run_dashboard(recorder, name, rows, workdir):
+    """Benchmark one dashboard dataset at ``rows`` rows."""
+    recorder.context = dict(recorder.context, dashboard=name, rows=rows)
+    raw = recorder.time("generate", "synthetic", lambda: SYNTHETIC[name](rows))
+    source = os.path.join(workdir, f"{name}-{rows}.parquet")
+    raw.to_parquet(source, index=False)
+    if rows <= XLSX_MAX_ROWS:
+        workbook = os.path.join(workdir, f"{name}-{rows}.xlsx")
+        raw.to_excel(workbook, index=False, engine="openpyxl")
+        xlsx_cache = os.path.join(workdir, "cache-xlsx")
+        recorder.time("load", "ingest_xlsx",
+                      lambda: data_cache.load_excel_cached(workbook, cache_dir=xlsx_cache, **datasets.INGEST[name]))
+        os.remove(workbook)
+    del raw
+
+    cache_dir = os.path.join(workdir, "cache")
+    load = lambda: data_cache.load_excel_cached(source, cache_dir=cache_dir, **datasets.INGEST[name])
+    recorder.time("load", "ingest", load)
+    raw = recorder.time("load", "cached", load)
+    recorder.note(memory_bytes=int(raw.memory_usage(deep=True).sum()))
+
+    dataset = recorder.time("prep", "prepare", lambda: PREPARE[name](raw))
+    recorder.note(memory_bytes=int(dataset.frame.memory_usage(deep=True).sum()))
+    del raw
+    recorder.time("prep", "filter_index", lambda: dataset.filter_index)
+    cubes = recorder.time("prep", "rollups", lambda: dataset.rollups)
+    cells = {cube: len(rollup.cells) for cube, rollup in cubes.items()}
+    recorder.note(cells=cells, cells_per_row={cube: count / len(dataset.frame) for cube, count in cells.items()})
+    if name == "activity":
+        recorder.time("prep", "anomalies", lambda: dataset.anomalies)
+
+    states = _cascade(recorder, dataset, filter_state.FILTER_CHAIN)
+    _charts(recorder, dataset, name, states)
+
+
+def _environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "pandas": pd.__version__,
+            "numpy": np.__version__, "platform": platform.platform(), "cpus": os.cpu_count(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmark of the dashboard pipeline on synthetic data.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, choices=list(SIZES),
+                        help="dataset sizes to run (default: %(default)s)")
+    parser.add_argument("--dashboards", nargs="+", default=list(SYNTHETIC), choices=list(SYNTHETIC))
+    parser.add_argument("--engine", default=query_engine.ENGINE, choices=list(query_engine.ENGINES),
+                        help="query engine for filters and aggregations (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per filter / aggregation step (fastest is reported)")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+    query_engine.ENGINE = args.engine
+
+    recorder = Recorder(repeat=args.repeat)
+    recorder.context = {"engine": query_engine.get().name}
+    with tempfile.TemporaryDirectory(prefix="altascio-bench-") as workdir:
+        for size in args.sizes:
+            for name in args.dashboards:
+                print(f"benchmarking {name} at {size} rows", file=sys.stderr)
+                run_dashboard(recorder, name, SIZES[size], workdir)
+
+    report = json.dumps({"environment": _environment(), "results": recorder.records}, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+import perf
+import scatter
+
+# -------------------------------
+# 🧩 Independently cached chart units
+# -------------------------------
+# Every chart on the dashboards is built by a function of (dataset, filters).
+# Results are memoized on (dataset name, dataset version, effective filters,
+# chart id), so on the next interaction a chart whose inputs did not change is
+# served from memory instead of being re-aggregated and re-plotted.  The memo
+# is process-wide and shared by all sessions.
+
+MAX_ENTRIES = 512
+
+_results = OrderedDict()
+_lock = threading.Lock()
+
+
+def filters_key(filters):
+    """Hashable, order-independent form of a ``{column: value}`` filter dict."""
+    return tuple(sorted((column, str(value)) for column, value in filters.items()))
+
+
+def cached(chart_id, dataset, filters, build):
+    """Return ``build(dataset, filters)``, memoized per dataset version, filters and chart id."""
+    key = (dataset.name, dataset.version, filters_key(filters), chart_id)
+    with _lock:
+        if key in _results:
+            _results.move_to_end(key)
+            perf.hit("chart_units", True)
+            return _results[key]
+    perf.hit("chart_units", False)
+    with perf.span("chart", chart=chart_id, dataset=dataset.name):
+        result = build(dataset, filters)
+    if hasattr(result, "to_json") and perf.payloads_enabled():
+        # Plotly figures are sent as JSON; measured once per cached figure, and only when asked for
+        with perf.span("serialise", chart=chart_id):
+            perf.payload(chart_id, len(result.to_json()), "plotly-json")
+    with _lock:
+        _results[key] = result
+        while len(_results) > MAX_ENTRIES:
+            _results.popitem(last=False)
+    return result
+
+
+def clear():
+    with _lock:
+        _results.clear()
+
+
+# Chart units run as fragments where Streamlit supports them, so widgets that
+# belong to a single chart rerun only that chart.
+fragment = getattr(st, "fragment", lambda func: func)
+
+
+@fragment
+def plotly_unit(chart_id, dataset, filters, build, subheader, empty_message=None, key=None):
+    """Render a memoized plotly chart unit; ``build`` returns ``None`` when there is no data."""
+    fig = cached(chart_id, dataset, filters, build)
+    if fig is None:
+        st.warning(empty_message)
+        return
+    st.subheader(subheader)
+    st.plotly_chart(fig, key=key)
+
+
+def chart_unit(chart, dataset, filters, key=None):
+    """Render the plotly ``charts.Chart`` ``chart`` as a memoized unit."""
+    plotly_unit(chart.chart_id, dataset, filters, chart.build, chart.title, chart.empty_message, key)
+
+
+@fragment
+def scatter_unit(chart_id, dataset, filters, build, subheader, empty_message=None, key=None):
+    """Render a memoized row-level scatter unit with its own render mode toggle.
+
+    ``build(dataset, filters, mode)`` returns a figure, or ``None`` when there is
+    no data.  Switching the mode only reruns this unit.
+    """
+    if dataset.count(filters) == 0:
+        st.warning(empty_message)
+        return
+    st.subheader(subheader)
+    mode = st.radio("Render mode", scatter.MODES, horizontal=True, key=f"{key or chart_id}_mode")
+    budget = scatter.SCATTER_POINT_BUDGET
+    fig = cached(f"{chart_id}:{mode}:{budget}", dataset, filters,
+                 lambda dataset, filters: build(dataset, filters, mode))
+    st.plotly_chart(fig, key=key)
@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import figures
+
+# -------------------------------
+# 📐 Chart specs shared by the dashboards and the batch reports
+# -------------------------------
+# A chart is split into its query (what is aggregated under a filter
+# selection) and its figure (how the aggregate is drawn).  The interactive
+# pages ask the query for one selection at a time; reports.py asks it for
+# every organization / physician at once with ``grouped``, which answers all
+# groups from a single aggregation, and draws the same figures.
+
+
+class CubeQuery:
+    """``measures`` aggregated by ``by`` through ``dataset.aggregate`` (rollup cube or query engine).
+
+    ``shape`` post-processes the aggregate (e.g. pivots it for a heatmap).
+    Unless ``allow_empty``, the data is ``None`` when the filters leave no rows.
+    """
+
+    def __init__(self, cube, by, measures, how="sum", shape=None, allow_empty=False):
+        self.cube, self.by, self.measures, self.how = cube, list(by), list(measures), how
+        self.shape = shape
+        self.allow_empty = allow_empty
+
+    def _shaped(self, table):
+        return self.shape(table) if self.shape else table
+
+    def data(self, dataset, filters):
+        if not self.allow_empty and dataset.count(filters) == 0:
+            return None
+        return self._shaped(dataset.aggregate(self.cube, filters, self.by, self.measures, self.how))
+
+    def grouped(self, dataset, keys):
+        """``(key tuple, data)`` for every combination of ``keys`` present, from one aggregation.
+
+        Each group's data equals ``data(dataset, dict(zip(keys, key)))``.
+        """
+        extra = [col for col in self.by if col not in keys]
+        table = dataset.aggregate(self.cube, {}, list(keys) + extra, self.measures, self.how)
+        for key, part in table.groupby(list(keys), observed=True, sort=True):
+            yield key, self._shaped(part[self.by + self.measures].reset_index(drop=True))
+
+
+class RowQuery:
+    """Data reduced from the matching rows themselves.
+
+    ``rows(dataset, filters, columns)`` returns the matching rows, including
+    the extra ``columns`` a grouped pass splits on; ``reduce`` turns one
+    selection's rows into the chart data.  The data is ``None`` when no rows match.
+    """
+
+    def __init__(self, rows, reduce=None):
+        self.rows = rows
+        self.reduce = reduce or (lambda frame: frame)
+
+    def data(self, dataset, filters):
+        frame = self.rows(dataset, filters, [])
+        return None if frame.empty else self.reduce(frame)
+
+    def grouped(self, dataset, keys):
+        frame = self.rows(dataset, {}, list(keys))
+        for key, part in frame.groupby(list(keys), observed=True, sort=True):
+            yield key, self.reduce(part)
+
+
+def frame_rows(columns):
+    """A RowQuery ``rows`` function returning ``columns`` of the prepared rows."""
+    def rows(dataset, filters, extra):
+        frame = dataset.rows(filters)
+        return frame[list(dict.fromkeys(list(columns) + list(extra)))]
+    return rows
+
+
+@dataclass(frozen=True)
+class Chart:
+    chart_id: str
+    title: str
+    query: object
+    figure: Optional[Callable] = None  # data -> plotly figure
+    draw: Optional[Callable] = None  # (ax, data) -> None, rasterised by figures.render_png
+    figsize: tuple = (10, 5)
+    empty_message: Optional[str] = None
+
+    def data(self, dataset, filters):
+        return self.query.data(dataset, filters)
+
+    def build(self, dataset, filters, *options):
+        """The plotly figure for ``filters`` (``options`` are passed on to ``figure``), or ``None``."""
+        data = self.data(dataset, filters)
+        return None if data is None else self.figure(data, *options)
+
+    def png(self, data):
+        return figures.render_png(self.chart_id, data, self.draw, self.figsize)
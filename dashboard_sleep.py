@@ -1,6 +1,17 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
+
+import chart_units
+import charts
+import data_cache
+import datasets
+import filter_state
+import image_cache
+import incremental
+import loader
+import participants
+import scatter
+import shared_store
 #import boto3
 #from io import BytesIO
 
@@ -9,143 +20,149 @@ import plotly.express as px
 # -------------------------------
 S3_PUBLIC_URL = "https://althealth.s3.us-east-1.amazonaws.com/Synthetic_Dataset_Sleep_V3.xlsx"
 
-@st.cache_data(ttl=1800)
-def load_s3_excel():
-    return pd.read_excel(S3_PUBLIC_URL, engine="openpyxl")
-
-def main():
-    st.title("Sleep Dashboard  💤")
+def load_s3_excel(source=None):
+    return data_cache.load_excel_cached(source or S3_PUBLIC_URL, **datasets.INGEST["sleep"])
 
-    # Load Data from S3
-    df = load_s3_excel()
+def build_dataset(source=None):
+    """Prepare the published source; ``source`` (a local file or URL) builds a standalone copy instead."""
+    df = load_s3_excel(source)
     if df is None:
-        st.error("Failed to load data from S3.")
-        return
-
-    # Convert necessary columns
-    numeric_cols = ["DurationInSeconds", "DeepSleep", "LightSleep", "RemSleep", "AwakeTime", "TimeSpent", "DurationAsleep"]
-    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors="coerce")
-    df["Start"] = pd.to_datetime(df["Start"], errors="coerce")
-    df["RecordDate"] = pd.to_datetime(df["RecordDate"], errors="coerce")
-    df["ParticipantName"] = df["LastName"] + " " + df["FirstName"]
+        return None
+    # Only rows that are new or changed since the published version are prepared
+    previous = shared_store.current("sleep") if source is None else None
+    dataset = incremental.refresh(previous, df, datasets.prepare_sleep)
+    dataset.participant_series  # computed here so the drilldown series are published with the data
+    return dataset
 
-    # Ensure AgeGroup is treated as a string
-    df["AgeGroup"] = df["AgeGroup"].astype(str)
-    
-    df["SleepEfficiency"] = ((df["DurationAsleep"] / df["TimeSpent"]) * 100).round(2)
+loader.register("sleep", build_dataset)
 
-    # Streamlit Sidebar Filters
-    st.sidebar.header("Filter Data")
+# Typed and enriched once, then shared read-only by every session and worker process.
+# Serves the last good copy and refreshes it in the background every 30 minutes.
+def load_dataset():
+    return loader.get("sleep")
 
-    # Organization Filter
-    selected_org = st.sidebar.selectbox("Select Organization", ["All"] + sorted(df["OrganizationName"].dropna().unique().tolist()))
-    df_filtered = df if selected_org == "All" else df[df["OrganizationName"] == selected_org]
+# -------------------------------
+# 📊 Chart units
+# -------------------------------
+# Each chart is a charts.Chart: a query of (dataset, filters) that chart_units
+# memoizes per dataset version, filters and chart id, plus the figure drawn
+# from its result.  Queries return None when the filters leave no rows and the
+# chart shows a warning instead.  reports.py renders the same specs (CHARTS).
 
-    # Cohort Filter (Dependent on Organization)
-    selected_cohort = st.sidebar.selectbox("Select Cohort", ["All"] + sorted(df_filtered["CohortName"].dropna().unique().tolist()))
-    df_filtered = df_filtered if selected_cohort == "All" else df_filtered[df_filtered["CohortName"] == selected_cohort]
+def avg_sleep_by_org_figure(avg_sleep_by_org):
+    return px.bar(avg_sleep_by_org, x="OrganizationName", y="DurationInSeconds", color="OrganizationName",
+                  title="Average Sleep Duration per Organization", labels={"DurationInSeconds": "Avg Sleep (Seconds)"}, barmode='group')
 
-    # Program Filter (Dependent on Cohort)
-    selected_program = st.sidebar.selectbox("Select Program", ["All"] + sorted(df_filtered["ProgramName"].dropna().unique().tolist()))
-    df_filtered = df_filtered if selected_program == "All" else df_filtered[df_filtered["ProgramName"] == selected_program]
+AVG_SLEEP_BY_ORG = charts.Chart(
+    "avg_sleep_by_org", "Average Sleep Duration per Organization",
+    charts.CubeQuery("daily", ["OrganizationName"], ["DurationInSeconds"], "mean", allow_empty=True),
+    figure=avg_sleep_by_org_figure)
+
+def sleep_duration_trend_figure(avg_sleep_trend):
+    return px.line(avg_sleep_trend, x="RecordDate", y="DurationInSeconds", markers=True,
+                   title="Sleep Duration Trend Over Time",
+                   labels={"DurationInSeconds": "Avg Sleep (Seconds)", "RecordDate": "Date"},
+                   line_shape='linear', render_mode='svg')
+
+SLEEP_DURATION_TREND = charts.Chart(
+    "sleep_duration_trend", "Sleep Duration Trend Over Time",
+    charts.CubeQuery("daily", ["RecordDate"], ["DurationInSeconds"], "mean"),
+    figure=sleep_duration_trend_figure,
+    empty_message="No data available for the selected filters.")
+
+def sleep_stages_figure(sleep_stages):
+    return px.bar(sleep_stages, x="OrganizationName", y=datasets.SLEEP_STAGE_COLS,
+                  title="Average Sleep Stages per Organization",
+                  labels={"value": "Avg Duration (Seconds)", "variable": "Sleep Stage"},
+                  barmode="stack")
+
+SLEEP_STAGES = charts.Chart(
+    "sleep_stages", "Sleep Stages Breakdown",
+    charts.CubeQuery("daily", ["OrganizationName"], datasets.SLEEP_STAGE_COLS, "mean"),
+    figure=sleep_stages_figure,
+    empty_message="No data available for Sleep Stages Breakdown.")
+
+def time_in_bed_vs_sleep_figure(df_filtered, mode=scatter.MODES[0]):
+    # Density-sampled / binned above the point budget so the payload stays bounded
+    return scatter.scatter_figure(df_filtered, x="TimeSpent", y="DurationAsleep",
+                                  title="Total Time in Bed vs. Actual Sleep",
+                                  labels={"TimeSpent": "Total Time in Bed (Seconds)", "DurationAsleep": "Actual Sleep Duration (Seconds)"},
+                                  opacity=0.7, color="OrganizationName", mode=mode)
+
+TIME_IN_BED_VS_SLEEP = charts.Chart(
+    "time_in_bed_vs_sleep", "Total Time in Bed vs. Actual Sleep",
+    charts.RowQuery(charts.frame_rows(["TimeSpent", "DurationAsleep", "OrganizationName"])),
+    figure=time_in_bed_vs_sleep_figure,
+    empty_message="No data available for Time in Bed vs. Actual Sleep.")
+
+def sleep_efficiency_by_org_figure(sleep_efficiency_by_org):
+    return px.bar(sleep_efficiency_by_org, x="OrganizationName", y="SleepEfficiency", color="OrganizationName",
+                  title="Average Sleep Efficiency per Organization (%)", labels={"SleepEfficiency": "Sleep Efficiency (%)"}, barmode='group')
 
-    # Physician Filter (Dependent on Organization)
-    selected_physician = st.sidebar.selectbox("Select Physician", ["All"] + sorted(df_filtered["PhysicianName"].dropna().unique().tolist()))
-    df_filtered = df_filtered if selected_physician == "All" else df_filtered[df_filtered["PhysicianName"] == selected_physician]
+SLEEP_EFFICIENCY_BY_ORG = charts.Chart(
+    "sleep_efficiency_by_org", "📊 Sleep Efficiency per Organization",
+    charts.CubeQuery("daily", ["OrganizationName"], ["SleepEfficiency"], "mean", allow_empty=True),
+    figure=sleep_efficiency_by_org_figure)
 
-    # Participant Filter (Dependent on Program)
-    selected_participant = st.sidebar.selectbox("Select Participant", ["All"] + sorted(df_filtered["ParticipantName"].dropna().unique().tolist()))
-    df_filtered = df_filtered if selected_participant == "All" else df_filtered[df_filtered["ParticipantName"] == selected_participant]
+def sleep_efficiency_vs_duration_figure(df_filtered, mode=scatter.MODES[0]):
+    return scatter.scatter_figure(df_filtered, x="DurationAsleep", y="SleepEfficiency", color="OrganizationName",
+                                  title="Relationship Between Sleep Efficiency and Sleep Duration",
+                                  labels={"DurationAsleep": "Duration Asleep (Seconds)", "SleepEfficiency": "Sleep Efficiency (%)"},
+                                  opacity=0.7, mode=mode)
 
-    # Gender Filter (Independent)
-    selected_gender = st.sidebar.selectbox("Select Gender", ["All"] + sorted(df_filtered["ParticipantGender"].dropna().unique().tolist()))
-    df_filtered = df_filtered if selected_gender == "All" else df_filtered[df_filtered["ParticipantGender"] == selected_gender]
+SLEEP_EFFICIENCY_VS_DURATION = charts.Chart(
+    "sleep_efficiency_vs_duration", "📊 Sleep Efficiency vs. Duration Asleep",
+    charts.RowQuery(charts.frame_rows(["DurationAsleep", "SleepEfficiency", "OrganizationName"])),
+    figure=sleep_efficiency_vs_duration_figure,
+    empty_message="No data available for Sleep Efficiency vs. Duration Asleep.")
 
-    # Ethnicity Filter (Independent)
-    selected_ethnicity = st.sidebar.selectbox("Select Ethnicity", ["All"] + sorted(df_filtered["Ethnicity"].dropna().unique().tolist()))
-    df_filtered = df_filtered if selected_ethnicity == "All" else df_filtered[df_filtered["Ethnicity"] == selected_ethnicity]
+CHARTS = [AVG_SLEEP_BY_ORG, SLEEP_DURATION_TREND, SLEEP_STAGES, TIME_IN_BED_VS_SLEEP,
+          SLEEP_EFFICIENCY_BY_ORG, SLEEP_EFFICIENCY_VS_DURATION]
 
-    # Age Group Filter (Using Existing Column)
-    selected_age_group = st.sidebar.selectbox("Select Age Group", ["All"] + sorted(df_filtered["AgeGroup"].dropna().unique().tolist()))
-    df_filtered = df_filtered if selected_age_group == "All" else df_filtered[df_filtered["AgeGroup"] == selected_age_group]
+def main(selection=None):
+    st.title("Sleep Dashboard  💤")
 
-    col1, col2 = st.columns([1, 1])
+    # Load Data from S3
+    dataset = load_dataset()
+    if dataset is None:
+        st.error("Failed to load data from S3.")
+        return
 
-    if selected_physician != "All":
-        physician_photo = df_filtered["PhysicianPhoto"].iloc[0].strip("'") if not pd.isna(df_filtered["PhysicianPhoto"].iloc[0]) else None
-        if physician_photo:
-            with col1:
-                st.image(physician_photo, caption=f"Physician: {selected_physician}", width=150)
+    # Sidebar filters are shared by both dashboards and survive switching pages (filter_state);
+    # app.py resolves them against the participant master table before calling main()
+    if selection is None:
+        selection = filter_state.sidebar(participants.current())
+    filters = selection.filters
 
-    if selected_participant != "All":
-        participant_photo = df_filtered["ParticipantPhotoURL"].iloc[0].strip("'") if not pd.isna(df_filtered["ParticipantPhotoURL"].iloc[0]) else None
-        if participant_photo:
-            with col2:
-                st.image(participant_photo, caption=f"Participant: {selected_participant}", width=150)
+    # Photos are served as cached 150px thumbnails
+    image_cache.show_photos(selection, physician=filters.get("PhysicianName"),
+                            participant=filters.get("ParticipantName"))
 
 
 
 
     # 📊 Data Visualizations
-    st.subheader("Average Sleep Duration per Organization")
-    avg_sleep_by_org = df_filtered.groupby("OrganizationName")["DurationInSeconds"].mean().reset_index()
-    fig1 = px.bar(avg_sleep_by_org, x="OrganizationName", y="DurationInSeconds", color="OrganizationName",
-                  title="Average Sleep Duration per Organization", labels={"DurationInSeconds": "Avg Sleep (Seconds)"}, barmode='group')
-    st.plotly_chart(fig1,key="avg_sleep_by_org")
+    chart_units.chart_unit(AVG_SLEEP_BY_ORG, dataset, filters, key="avg_sleep_by_org")
 
     # Sleep Duration Trend Over Time
-    if not df_filtered.empty:
-        st.subheader("Sleep Duration Trend Over Time")
-        avg_sleep_trend = df_filtered.groupby("RecordDate")["DurationInSeconds"].mean().reset_index()
-        fig2 = px.line(avg_sleep_trend, x="RecordDate", y="DurationInSeconds", markers=True,
-                       title="Sleep Duration Trend Over Time",
-                       labels={"DurationInSeconds": "Avg Sleep (Seconds)", "RecordDate": "Date"},
-                       line_shape='linear', render_mode='svg')
-        st.plotly_chart(fig2,key="sleep_duratoin_trend")
-    else:
-        st.warning("No data available for the selected filters.")
+    chart_units.chart_unit(SLEEP_DURATION_TREND, dataset, filters, key="sleep_duratoin_trend")
 
     # Sleep Stages Breakdown
-    if not df_filtered.empty:
-        st.subheader("Sleep Stages Breakdown")
-        sleep_stages = df_filtered.groupby("OrganizationName")[["DeepSleep", "LightSleep", "RemSleep", "AwakeTime"]].mean().reset_index()
-        fig3 = px.bar(sleep_stages, x="OrganizationName", y=["DeepSleep", "LightSleep", "RemSleep", "AwakeTime"],
-                      title="Average Sleep Stages per Organization",
-                      labels={"value": "Avg Duration (Seconds)", "variable": "Sleep Stage"},
-                      barmode="stack")
-        st.plotly_chart(fig3,key="sleep_stages")
-    else:
-        st.warning("No data available for Sleep Stages Breakdown.")
+    chart_units.chart_unit(SLEEP_STAGES, dataset, filters, key="sleep_stages")
 
     # Total Time in Bed vs. Actual Sleep
-    if not df_filtered.empty:
-        st.subheader("Total Time in Bed vs. Actual Sleep")
-        fig4 = px.scatter(df_filtered, x="TimeSpent", y="DurationAsleep",
-                          title="Total Time in Bed vs. Actual Sleep",
-                          labels={"TimeSpent": "Total Time in Bed (Seconds)", "DurationAsleep": "Actual Sleep Duration (Seconds)"},
-                          opacity=0.7, color="OrganizationName")
-        st.plotly_chart(fig4,key="totaltimeinbed_vs_actualsleep")
-    else:
-        st.warning("No data available for Time in Bed vs. Actual Sleep.")
+    chart_units.scatter_unit(TIME_IN_BED_VS_SLEEP.chart_id, dataset, filters, TIME_IN_BED_VS_SLEEP.build,
+                            TIME_IN_BED_VS_SLEEP.title, TIME_IN_BED_VS_SLEEP.empty_message,
+                            key="totaltimeinbed_vs_actualsleep")
         
         
 # Sleep Efficiency by Organization
-    st.subheader("📊 Sleep Efficiency per Organization")
-    sleep_efficiency_by_org = df_filtered.groupby("OrganizationName")["SleepEfficiency"].mean().reset_index()
-    fig5 = px.bar(sleep_efficiency_by_org, x="OrganizationName", y="SleepEfficiency", color="OrganizationName",
-                  title="Average Sleep Efficiency per Organization (%)", labels={"SleepEfficiency": "Sleep Efficiency (%)"}, barmode='group')
-    st.plotly_chart(fig5,key="avg_sleep_eff_org")
+    chart_units.chart_unit(SLEEP_EFFICIENCY_BY_ORG, dataset, filters, key="avg_sleep_eff_org")
 
    # Sleep Efficiency vs. Duration Asleep
-    if not df_filtered.empty:
-        st.subheader("📊 Sleep Efficiency vs. Duration Asleep")
-        fig6 = px.scatter(df_filtered, x="DurationAsleep", y="SleepEfficiency", color="OrganizationName",
-                      title="Relationship Between Sleep Efficiency and Sleep Duration",
-                      labels={"DurationAsleep": "Duration Asleep (Seconds)", "SleepEfficiency": "Sleep Efficiency (%)"},
-                      opacity=0.7)
-        st.plotly_chart(fig6, key="sleep_eff_vs_durationasleep")
-    else:
-        st.warning("No data available for Sleep Efficiency vs. Duration Asleep.")
+    chart_units.scatter_unit(SLEEP_EFFICIENCY_VS_DURATION.chart_id, dataset, filters, SLEEP_EFFICIENCY_VS_DURATION.build,
+                            SLEEP_EFFICIENCY_VS_DURATION.title, SLEEP_EFFICIENCY_VS_DURATION.empty_message,
+                            key="sleep_eff_vs_durationasleep")
 
 
     # Sleep Duration by Gender
@@ -1,92 +1,195 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import matplotlib.pyplot as plt
 import seaborn as sns
 
+import anomalies
+import chart_units
+import charts
+import data_cache
+import datasets
+import filter_state
+import image_cache
+import incremental
+import loader
+import participants
+import shared_store
+
 
 
 S3_PUBLIC_URL = "https://althealth.s3.us-east-1.amazonaws.com/Synthetic_Dataset_Activity_V3.xlsx"
 
-@st.cache_data(ttl=1800)
-def load_s3_excel():
-    return pd.read_excel(S3_PUBLIC_URL, engine="openpyxl")
+def load_s3_excel(source=None):
+    return data_cache.load_excel_cached(source or S3_PUBLIC_URL, **datasets.INGEST["activity"])
+
+def build_dataset(source=None):
+    """Prepare the published source; ``source`` (a local file or URL) builds a standalone copy instead."""
+    df = load_s3_excel(source)
+    if df is None:
+        return None
+    # Only rows that are new or changed since the published version are prepared
+    previous = shared_store.current("activity") if source is None else None
+    dataset = incremental.refresh(previous, df, datasets.prepare_activity)
+    # Computed here so the anomaly flags and drilldown series are published with the data
+    dataset.anomalies
+    dataset.participant_series
+    return dataset
+
+loader.register("activity", build_dataset)
+
+# Typed and enriched once, then shared read-only by every session and worker process.
+# Serves the last good copy and refreshes it in the background every 30 minutes.
+def load_dataset():
+    return loader.get("activity")
+
+# -------------------------------
+# 📊 Chart units
+# -------------------------------
+# Each chart is a charts.Chart: a query of (dataset, filters) that chart_units
+# memoizes per dataset version, filters and chart id, plus the figure drawn
+# from its result.  Queries return None when the filters leave no rows.  The
+# same specs (CHARTS) are rendered per organization / physician by reports.py.
+
+def _trend_figure(column, title, label):
+    def figure(trend):
+        return px.line(trend, x="RecordDate", y=column, markers=True,
+                       title=title,
+                       labels={column: label, "RecordDate": "Date"},
+                       line_shape='linear', render_mode='svg')
+    return figure
+
+STEPS_TREND = charts.Chart(
+    "steps_trend", "Steps Trend Over Time",
+    charts.CubeQuery("daily", ["RecordDate"], ["Steps"]),
+    figure=_trend_figure("Steps", "Steps Trend Over Time", "Total Steps"),
+    empty_message="No data available for Steps Trend.")
+
+DISTANCE_TREND = charts.Chart(
+    "distance_trend", "Distance Covered Trend",
+    charts.CubeQuery("daily", ["RecordDate"], ["DistanceInMeters"]),
+    figure=_trend_figure("DistanceInMeters", "Distance Covered Trend Over Time", "Total Distance (Meters)"),
+    empty_message="No data available for Distance Covered Trend.")
+
+CALORIES_TREND = charts.Chart(
+    "calories_trend", "Calories Burned Trend",
+    charts.CubeQuery("daily", ["RecordDate"], ["Calories"]),
+    figure=_trend_figure("Calories", "Calories Burned Trend Over Time", "Total Calories Burned"),
+    empty_message="No data available for Calories Burned Trend.")
+
+def activity_intensity_figure(activity_intensity):
+    return px.bar(activity_intensity, x="OrganizationName", y=datasets.INTENSITY_COLS,
+                  title="Activity Intensity Breakdown",
+                  labels={"value": "Total Duration (Seconds)", "variable": "Activity Intensity"},
+                  barmode="stack")
+
+ACTIVITY_INTENSITY = charts.Chart(
+    "activity_intensity", "Activity Intensity Breakdown",
+    charts.CubeQuery("daily", ["OrganizationName"], datasets.INTENSITY_COLS),
+    figure=activity_intensity_figure,
+    empty_message="No data available for Activity Intensity Breakdown.")
+
+def heatmap_shape(table):
+    # Time of Day in 2-hour slots (TimeSlot is precomputed when the dataset is prepared)
+    return (table.set_index(["TimeSlot", "OrganizationName"])["Steps"]
+            .unstack(fill_value=0)
+            .reindex(datasets.TIME_SLOT_LABELS, fill_value=0))
+
+# Matplotlib/seaborn drawing on an explicit Axes; figures.render_png owns the Figure and caches the PNG
+
+def draw_heatmap(ax, heatmap_data):
+    sns.heatmap(heatmap_data, cmap="Blues", linewidths=0.5, annot=True, fmt=".0f", ax=ax)
+    ax.set_xlabel("Organization")
+    ax.set_ylabel("Time Slot")
+    ax.set_title("Activity Patterns by Time of Day")
+
+HEATMAP = charts.Chart(
+    "heatmap", "Activity Patterns by Time of Day (Heatmap)",
+    charts.CubeQuery("timeslot", ["TimeSlot", "OrganizationName"], ["Steps"], shape=heatmap_shape),
+    draw=draw_heatmap, figsize=(10, 6),
+    empty_message="No data available for Activity Patterns Heatmap.")
+
+def weekly_trends_figure(weekly_trends):
+    return px.line(weekly_trends, x="DayOfWeek", y=["Steps", "DistanceInMeters", "Calories"], 
+                   title="Weekly Trends in Activity",
+                   labels={"value": "Total Activity", "variable": "Metric"},
+                   markers=True)
+
+WEEKLY_TRENDS = charts.Chart(
+    "weekly_trends", "Weekly Trends in Steps, Distance & Calories",
+    # Day of the Week is precomputed when the dataset is prepared
+    charts.CubeQuery("daily", ["DayOfWeek"], ["Steps", "DistanceInMeters", "Calories"]),
+    figure=weekly_trends_figure,
+    empty_message="No data available for Weekly Trends.")
+
+# Anomaly flags (source AnomalyType + rolling median/MAD z-scores) are computed once per dataset; these only slice them
+
+def anomaly_type_counts(flags):
+    return flags["AnomalyLabel"].value_counts()
+
+def anomaly_trend_counts(flags):
+    return flags.groupby("RecordDate")["IsAnomaly"].sum()
+
+def top_anomaly_participants(flags):
+    per_participant = flags.groupby("ParticipantName")["IsAnomaly"].sum()
+    return per_participant[per_participant > 0].sort_values(ascending=False).head(10)
+
+def draw_anomaly_counts(ax, anomaly_counts):
+    sns.barplot(x=anomaly_counts.index, y=anomaly_counts.values, ax=ax, palette="coolwarm")
+    ax.set_title("Anomaly Type Distribution")
+    ax.set_xlabel("Anomaly Type")
+    ax.set_ylabel("Count")
+    ax.set_xticklabels(ax.get_xticklabels(), rotation=45, ha="right")
+
+def draw_anomaly_trend(ax, anomaly_trend):
+    anomaly_trend.plot(ax=ax, color="red", marker="o", linestyle="-")
+    ax.set_title("Anomalies Over Time")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Number of Anomalies")
+
+def draw_top_anomalies(ax, top_anomalies):
+    sns.barplot(x=top_anomalies.values, y=top_anomalies.index, ax=ax, palette="magma")
+    ax.set_title("Top 10 Participants with Most Anomalies")
+    ax.set_xlabel("Number of Anomalies")
+    ax.set_ylabel("Participant Name")
+
+ANOMALY_COUNTS = charts.Chart(
+    "anomaly_counts", "Anomaly Type Breakdown",
+    charts.RowQuery(anomalies.for_selection, anomaly_type_counts),
+    draw=draw_anomaly_counts, figsize=(8, 5),
+    empty_message="No data available for Activity Anomalies.")
+
+ANOMALY_TREND = charts.Chart(
+    "anomaly_trend", "Anomalies Over Time",
+    charts.RowQuery(anomalies.for_selection, anomaly_trend_counts),
+    draw=draw_anomaly_trend, figsize=(10, 5),
+    empty_message="No data available for Anomalies Over Time.")
+
+TOP_ANOMALIES = charts.Chart(
+    "top_anomalies", "Top 10 Participants with  Most Anomalies",
+    charts.RowQuery(anomalies.for_selection, top_anomaly_participants),
+    draw=draw_top_anomalies, figsize=(8, 5),
+    empty_message="No data available for Top Anomalies.")
+
+CHARTS = [STEPS_TREND, DISTANCE_TREND, CALORIES_TREND, ACTIVITY_INTENSITY, HEATMAP,
+          WEEKLY_TRENDS, ANOMALY_COUNTS, ANOMALY_TREND, TOP_ANOMALIES]
  
-def main():
+def main(selection=None):
     st.title("Steps Dashboard 🏃‍♂️")
   
-    df_activity = load_s3_excel()
-    if df_activity is None:
+    dataset = load_dataset()
+    if dataset is None:
         st.error("Failed to load data from S3.")
         return # Call the function to get the cached DataFrame
 
-
-    # Convert necessary columns
-    numeric_cols = ["Steps", "DistanceInMeters", "Calories", "VigorousIntensityDurationInSeconds",
-                    "ModerateIntensityDurationInSeconds", "SedentaryDurationInSeconds","LightIntensityDurationInSeconds"]
-    df_activity[numeric_cols] = df_activity[numeric_cols].apply(pd.to_numeric, errors="coerce")
-    df_activity["RecordDate"] = pd.to_datetime(df_activity["RecordDate"], errors="coerce")
-    df_activity["StartTimeFormatted"] = pd.to_datetime(df_activity["StartTimeOffsetFormatted"], errors="coerce")
-    # Create Participant Name
-    df_activity["ParticipantName"] = df_activity["LastName"] + " " + df_activity["FirstName"]
-
     # Streamlit App Layout
     #st.title("Activity Tracking Dashboard 🏃‍♂️")
-    st.sidebar.header("Filter Data")
 
 #import streamlit as st
 
-    # Select Organization
-    selected_org = st.sidebar.selectbox("Select Organization", ["All"] + sorted(df_activity["OrganizationName"].dropna().unique().tolist()))
-
-    # Filter Data Based on Organization
-    filtered_df = df_activity.copy()
-    if selected_org != "All":
-        filtered_df = filtered_df[filtered_df["OrganizationName"] == selected_org]
-
-    # Select Cohort (Filtered Based on Organization)
-    selected_cohort = st.sidebar.selectbox("Select Cohort", ["All"] + sorted(filtered_df["CohortName"].dropna().unique().tolist()))
-    if selected_cohort != "All":
-        filtered_df = filtered_df[filtered_df["CohortName"] == selected_cohort]
-
-    # Select Program (Filtered Based on Cohort)
-    selected_program = st.sidebar.selectbox("Select Program", ["All"] + sorted(filtered_df["ProgramName"].dropna().unique().tolist()))
-    if selected_program != "All":
-        filtered_df = filtered_df[filtered_df["ProgramName"] == selected_program]
-
-    # Select Physician (Filtered Based on Program)
-    selected_physician = st.sidebar.selectbox("Select Physician", ["All"] + sorted(filtered_df["PhysicianName"].dropna().unique().tolist()))
-    if selected_physician != "All":
-        filtered_df = filtered_df[filtered_df["PhysicianName"] == selected_physician]
-
-    # Select Gender BEFORE Participant (To prevent conflicts)
-    selected_gender = st.sidebar.selectbox("Select Gender", ["All"] + sorted(filtered_df["ParticipantGender"].dropna().unique().tolist()))
-    if selected_gender != "All":
-        filtered_df = filtered_df[filtered_df["ParticipantGender"] == selected_gender]
-
-    # Select Age Group (Filtered Based on Gender)
-    selected_age_group = st.sidebar.selectbox("Select Age Group", ["All"] + sorted(filtered_df["AgeGroup"].dropna().unique().tolist()))
-    if selected_age_group != "All":
-        filtered_df = filtered_df[filtered_df["AgeGroup"] == selected_age_group]
-
-    # Select Ethnicity (Filtered Based on Gender & Age Group)
-    selected_ethnicity = st.sidebar.selectbox("Select Ethnicity", ["All"] + sorted(filtered_df["Ethnicity"].dropna().unique().tolist()))
-    if selected_ethnicity != "All":
-        filtered_df = filtered_df[filtered_df["Ethnicity"] == selected_ethnicity]
-
-    # Select City (Filtered Based on Ethnicity)
-    selected_city = st.sidebar.selectbox("Select City", ["All"] + sorted(filtered_df["City"].dropna().unique().tolist()))
-    if selected_city != "All":
-        filtered_df = filtered_df[filtered_df["City"] == selected_city]
-
-    # Select Participant (Filtered Based on Previous Selections)
-    valid_participants = sorted(filtered_df["ParticipantName"].dropna().unique().tolist())
-    selected_participant = st.sidebar.selectbox("Select Participant", ["All"] + valid_participants)
-    if selected_participant != "All":
-        filtered_df = filtered_df[filtered_df["ParticipantName"] == selected_participant]
-
-    # Final Filtered Data
-    df_filtered = filtered_df.copy()
+    # Sidebar filters are shared by both dashboards and survive switching pages (filter_state);
+    # app.py resolves them against the participant master table before calling main()
+    if selection is None:
+        selection = filter_state.sidebar(participants.current())
+    filters = selection.filters
 
 
 
@@ -134,174 +237,75 @@ def main():
     #if selected_country != "All":
      #   df_filtered = df_filtered[df_filtered["Country"] == selected_country]
 
-    # Display Participant and Physician Photos in Main Dashboard
-    col1, col2 = st.columns([1, 1])
-
-    if selected_physician != "All":
-        physician_photo = df_filtered["PhysicianPhoto"].iloc[0].strip("'") if not pd.isna(df_filtered["PhysicianPhoto"].iloc[0]) else None
-        if physician_photo:
-            with col1:
-                st.image(physician_photo, caption=f"Physician: {selected_physician}", width=150)
-
-    if selected_participant != "All":
-        participant_photo = df_filtered["ParticipantPhotoURL"].iloc[0].strip("'") if not pd.isna(df_filtered["ParticipantPhotoURL"].iloc[0]) else None
-        if participant_photo:
-            with col2:
-                st.image(participant_photo, caption=f"Participant: {selected_participant}", width=150)
+    # Display Participant and Physician Photos in Main Dashboard (cached 150px thumbnails)
+    image_cache.show_photos(selection, physician=filters.get("PhysicianName"),
+                            participant=filters.get("ParticipantName"))
 
     # 1️⃣ Steps Trend Over Time
-    if not df_filtered.empty:
-        st.subheader("Steps Trend Over Time")
-        steps_trend = df_filtered.groupby("RecordDate")["Steps"].sum().reset_index()
-        fig1 = px.line(steps_trend, x="RecordDate", y="Steps", markers=True,
-                       title="Steps Trend Over Time",
-                       labels={"Steps": "Total Steps", "RecordDate": "Date"},
-                       line_shape='linear', render_mode='svg')
-        st.plotly_chart(fig1)
-    else:
-        st.warning("No data available for Steps Trend.")
+    chart_units.chart_unit(STEPS_TREND, dataset, filters)
 
     # 2️⃣ Distance Covered Trend
-    if not df_filtered.empty:
-        st.subheader("Distance Covered Trend")
-        distance_trend = df_filtered.groupby("RecordDate")["DistanceInMeters"].sum().reset_index()
-        fig2 = px.line(distance_trend, x="RecordDate", y="DistanceInMeters", markers=True,
-                       title="Distance Covered Trend Over Time",
-                       labels={"DistanceInMeters": "Total Distance (Meters)", "RecordDate": "Date"},
-                       line_shape='linear', render_mode='svg')
-        st.plotly_chart(fig2)
-    else:
-        st.warning("No data available for Distance Covered Trend.")
+    chart_units.chart_unit(DISTANCE_TREND, dataset, filters)
 
     # 3️⃣ Calories Burned Trend
-    if not df_filtered.empty:
-        st.subheader("Calories Burned Trend")
-        calories_trend = df_filtered.groupby("RecordDate")["Calories"].sum().reset_index()
-        fig3 = px.line(calories_trend, x="RecordDate", y="Calories", markers=True,
-                       title="Calories Burned Trend Over Time",
-                       labels={"Calories": "Total Calories Burned", "RecordDate": "Date"},
-                       line_shape='linear', render_mode='svg')
-        st.plotly_chart(fig3)
-    else:
-        st.warning("No data available for Calories Burned Trend.")
+    chart_units.chart_unit(CALORIES_TREND, dataset, filters)
 
     # 4️⃣ Activity Intensity Breakdown (Stacked Bar)
-    if not df_filtered.empty:
-        st.subheader("Activity Intensity Breakdown")
-        activity_intensity = df_filtered.groupby("OrganizationName")[["VigorousIntensityDurationInSeconds",
-                                                                      "ModerateIntensityDurationInSeconds",
-                                                                      "LightIntensityDurationInSeconds",
-                                                                      "SedentaryDurationInSeconds"]].sum().reset_index()
-        fig4 = px.bar(activity_intensity, x="OrganizationName", y=["VigorousIntensityDurationInSeconds",
-                                                                    "ModerateIntensityDurationInSeconds",
-                                                                    "LightIntensityDurationInSeconds",
-                                                                    "SedentaryDurationInSeconds"],
-                      title="Activity Intensity Breakdown",
-                      labels={"value": "Total Duration (Seconds)", "variable": "Activity Intensity"},
-                      barmode="stack")
-        st.plotly_chart(fig4)
-    else:
-        st.warning("No data available for Activity Intensity Breakdown.")
+    chart_units.chart_unit(ACTIVITY_INTENSITY, dataset, filters)
 
     # 1️⃣ Activity Patterns by Time of Day (Heatmap)
-    if not df_filtered.empty:
-        st.subheader("Activity Patterns by Time of Day (Heatmap)")
-        
-        # Extract Time of Day in 2-hour slots
-        df_filtered["Hour"] = df_filtered["StartTimeFormatted"].dt.hour
-        df_filtered["TimeSlot"] = pd.cut(df_filtered["Hour"], bins=[0, 2, 4, 6, 8, 10, 12, 14, 16, 18, 20, 22, 24],
-                                         labels=["00-02", "02-04", "04-06", "06-08", "08-10", "10-12", 
-                                                 "12-14", "14-16", "16-18", "18-20", "20-22", "22-00"])
-
-        # Apply Hierarchical Filters
-        heatmap_data = df_filtered.groupby(["TimeSlot", "OrganizationName"])["Steps"].sum().unstack()
+    heatmap_data = chart_units.cached(HEATMAP.chart_id + "_data", dataset, filters, HEATMAP.data)
+    if heatmap_data is not None:
+        st.subheader(HEATMAP.title)
 
         if not heatmap_data.empty:
             # Plot Heatmap
-            plt.figure(figsize=(10, 6))
-            sns.heatmap(heatmap_data, cmap="Blues", linewidths=0.5, annot=True, fmt=".0f")
-            plt.xlabel("Organization")
-            plt.ylabel("Time Slot")
-            plt.title("Activity Patterns by Time of Day")
-            st.pyplot(plt)
+            st.image(HEATMAP.png(heatmap_data), width="stretch")
         else:
             st.warning("No data available after applying filters.")
     else:
-        st.warning("No data available for Activity Patterns Heatmap.")
+        st.warning(HEATMAP.empty_message)
 
     # 2️⃣ Weekly Trends in Steps, Distance & Calories
-    if not df_filtered.empty:
-        st.subheader("Weekly Trends in Steps, Distance & Calories")
-        
-        # Extract Day of the Week
-        df_filtered["DayOfWeek"] = df_filtered["RecordDate"].dt.day_name()
-
-        # Apply Hierarchical Filters
-        weekly_trends = df_filtered.groupby("DayOfWeek")[["Steps", "DistanceInMeters", "Calories"]].sum().reset_index()
-
-        if not weekly_trends.empty:
-            # Create Line Chart
-            fig_weekly = px.line(weekly_trends, x="DayOfWeek", y=["Steps", "DistanceInMeters", "Calories"], 
-                                 title="Weekly Trends in Activity",
-                                 labels={"value": "Total Activity", "variable": "Metric"},
-                                 markers=True)
-            st.plotly_chart(fig_weekly)
-        else:
-            st.warning("No data available after applying filters.")
-    else:
-        st.warning("No data available for Weekly Trends.")
+    chart_units.chart_unit(WEEKLY_TRENDS, dataset, filters)
 
     # 3️⃣ Anomalies in Activity Data (Box Plot)
     
     
     # Count anomalies by type
-    anomaly_counts = df_filtered["AnomalyType"].value_counts()
+    anomaly_counts = chart_units.cached(ANOMALY_COUNTS.chart_id, dataset, filters, ANOMALY_COUNTS.data)
     
-    if not df_filtered.empty:
-        st.subheader("Anomaly Type Breakdown")
+    if dataset.count(filters) > 0:
+        st.subheader(ANOMALY_COUNTS.title)
         
         # Apply Hierarchical Filters
-        if "OrganizationName" in df_filtered.columns and not df_filtered.empty:
+        if anomaly_counts is not None:
            # Plot anomaly type distribution
-            fig, ax = plt.subplots(figsize=(8, 5))
-            sns.barplot(x=anomaly_counts.index, y=anomaly_counts.values, ax=ax, palette="coolwarm")
-            ax.set_title("Anomaly Type Distribution")
-            ax.set_xlabel("Anomaly Type")
-            ax.set_ylabel("Count")
-            ax.set_xticklabels(ax.get_xticklabels(), rotation=45, ha="right")
-            st.pyplot(fig)
+            st.image(ANOMALY_COUNTS.png(anomaly_counts), width="stretch")
         else:
             st.warning("No data available after applying filters.")
     else:
-        st.warning("No data available for Activity Anomalies.")
+        st.warning(ANOMALY_COUNTS.empty_message)
 
-    # Convert Date column to datetime
-    df_filtered["RecordDate"] = pd.to_datetime(df_filtered["RecordDate"])
-    st.subheader("Anomalies Over Time")
+    st.subheader(ANOMALY_TREND.title)
     # Count anomalies per day
-    anomaly_trend = df_filtered.groupby("RecordDate")["AnomalyType"].count()
+    anomaly_trend = chart_units.cached(ANOMALY_TREND.chart_id, dataset, filters, ANOMALY_TREND.data)
 
     # Plot anomaly trend over time
-    fig, ax = plt.subplots(figsize=(10, 5))
-    anomaly_trend.plot(ax=ax, color="red", marker="o", linestyle="-")
-    ax.set_title("Anomalies Over Time")
-    ax.set_xlabel("Date")
-    ax.set_ylabel("Number of Anomalies")
-
-    st.pyplot(fig)
+    if anomaly_trend is not None:
+        st.image(ANOMALY_TREND.png(anomaly_trend), width="stretch")
+    else:
+        st.warning(ANOMALY_TREND.empty_message)
 
 
     # Count anomalies per participant
-    top_anomalies = df_filtered["ParticipantName"].value_counts().head(10)
-    st.subheader("Top 10 Participants with  Most Anomalies") 
+    top_anomalies = chart_units.cached(TOP_ANOMALIES.chart_id, dataset, filters, TOP_ANOMALIES.data)
+    st.subheader(TOP_ANOMALIES.title) 
     # Plot bar chart
-    fig, ax = plt.subplots(figsize=(8, 5))
-    sns.barplot(x=top_anomalies.values, y=top_anomalies.index, ax=ax, palette="magma")
-    ax.set_title("Top 10 Participants with Most Anomalies")
-    ax.set_xlabel("Number of Anomalies")
-    ax.set_ylabel("Participant Name")
-
-    st.pyplot(fig)
+    if top_anomalies is not None:
+        st.image(TOP_ANOMALIES.png(top_anomalies), width="stretch")
+    else:
+        st.warning(TOP_ANOMALIES.empty_message)
 
 
 
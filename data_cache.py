@@ -0,0 +1,247 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import urllib.request
+from email.utils import formatdate
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import perf
+
+# -------------------------------
+# 📦 Local columnar cache for the S3 workbooks
+# -------------------------------
+# Each workbook is parsed with openpyxl once, written to a typed Parquet file
+# and re-used until the source's ETag / Last-Modified changes.  Later loads
+# memory-map the Parquet file and only materialise the requested columns.
+#
+# Parsing streams the rows: openpyxl's read-only mode (or a chunked CSV /
+# Parquet reader) yields CHUNK_ROWS rows at a time, each chunk is typed and
+# appended to the Parquet file, and unused columns are dropped on the way, so
+# peak memory follows the chunk size rather than the workbook size.
+
+CACHE_DIR = os.environ.get("DASHBOARD_CACHE_DIR", os.path.join(tempfile.gettempdir(), "altascio-cache"))
+HTTP_TIMEOUT = 30
+# Rows parsed and coerced per step while ingesting; bounds peak memory during a (re)load
+CHUNK_ROWS = int(os.environ.get("DASHBOARD_CHUNK_ROWS", 50_000))
+DOWNLOAD_BLOCK = 1024 * 1024
+
+
+def _slug(source):
+    name = os.path.splitext(os.path.basename(source.split("?")[0]))[0] or "dataset"
+    return f"{name}-{hashlib.sha1(source.encode()).hexdigest()[:10]}"
+
+
+def _is_remote(source):
+    return source.startswith(("http://", "https://"))
+
+
+def source_validator(source):
+    """Return a dict identifying the current revision of ``source``.
+
+    Remote sources are checked with a ``HEAD`` request (ETag / Last-Modified,
+    else Content-Length); local files use their size and modification time.
+    Returns ``None`` when the source cannot be reached, in which case any
+    cached copy is served as-is.
+    """
+    if not _is_remote(source):
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        return {"etag": f"{stat.st_size}-{stat.st_mtime_ns}", "last_modified": formatdate(stat.st_mtime, usegmt=True)}
+
+    request = urllib.request.Request(source, method="HEAD")
+    try:
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            validator = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+            if not any(validator.values()):
+                validator["content_length"] = response.headers.get("Content-Length")
+            return validator
+    except OSError:
+        return None
+
+
+def _paths(source, cache_dir):
+    base = os.path.join(cache_dir, _slug(source))
+    return base + ".parquet", base + ".json"
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _atomic_write(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _download(source, path):
+    with urllib.request.urlopen(source, timeout=HTTP_TIMEOUT) as response, open(path, "wb") as f:
+        shutil.copyfileobj(response, f, DOWNLOAD_BLOCK)
+
+
+def _excel_chunks(path, chunk_rows):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        # The first sheet, as pd.read_excel reads it, not whichever sheet was active when saved
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        width = len(columns)
+        chunk, yielded = [], False
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            if len(chunk) >= chunk_rows:
+                yield pd.DataFrame.from_records(chunk, columns=columns)
+                chunk, yielded = [], True
+        if chunk or not yielded:
+            yield pd.DataFrame.from_records(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _csv_chunks(path, chunk_rows):
+    # Everything arrives as text; _coerce_chunk types the declared columns
+    yield from pd.read_csv(path, chunksize=chunk_rows, dtype=str)
+
+
+def _parquet_chunks(path, chunk_rows):
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+def iter_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield the rows of a local workbook, CSV or Parquet file as frames of at most ``chunk_rows`` rows."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return _csv_chunks(path, chunk_rows)
+    if extension in (".parquet", ".pq"):
+        return _parquet_chunks(path, chunk_rows)
+    return _excel_chunks(path, chunk_rows)
+
+
+def _coerce_chunk(chunk, numeric, dates):
+    for col in chunk.columns:
+        if col in numeric:
+            chunk[col] = pd.to_numeric(chunk[col], errors="coerce").astype("float64")
+        elif col in dates:
+            values = pd.to_datetime(chunk[col], errors="coerce")
+            # Keep the local wall-clock time, as the dashboards read hours off it
+            chunk[col] = values.dt.tz_localize(None) if values.dt.tz is not None else values
+        else:
+            # Excel columns frequently mix numbers and text; Arrow needs one type per column
+            chunk[col] = chunk[col].astype("string")
+    return chunk
+
+
+def _chunk_schema(columns, numeric, dates):
+    return pa.schema([(col, pa.float64() if col in numeric else pa.timestamp("ns") if col in dates else pa.string())
+                      for col in columns])
+
+
+def convert(source, parquet_path, numeric=(), dates=(), drop=(), chunk_rows=CHUNK_ROWS):
+    """Stream ``source`` into ``parquet_path`` one chunk of ``chunk_rows`` rows at a time.
+
+    ``numeric`` columns are stored as float64, ``dates`` as timestamps and
+    every other column as text; ``drop`` columns are never stored.  Only one
+    chunk is held in memory at a time.  Remote sources are downloaded to a
+    temporary file first, since workbooks can't be read from a stream.
+    """
+    local, downloaded = source, None
+    if _is_remote(source):
+        extension = os.path.splitext(source.split("?")[0])[1]
+        fd, downloaded = tempfile.mkstemp(dir=os.path.dirname(parquet_path), suffix=extension)
+        os.close(fd)
+        local = downloaded
+    try:
+        if downloaded:
+            _download(source, downloaded)
+
+        def write(tmp_path):
+            writer = None
+            try:
+                for chunk in iter_chunks(local, chunk_rows):
+                    chunk = _coerce_chunk(chunk.drop(columns=[c for c in drop if c in chunk.columns]), numeric, dates)
+                    if writer is None:
+                        schema = _chunk_schema(chunk.columns, numeric, dates)
+                        writer = pq.ParquetWriter(tmp_path, schema)
+                    table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                    writer.write_table(table.replace_schema_metadata(None))
+            finally:
+                if writer is not None:
+                    writer.close()
+            if writer is None:
+                raise ValueError(f"{source} has no header row")
+
+        _atomic_write(parquet_path, write)
+    finally:
+        if downloaded and os.path.exists(downloaded):
+            os.remove(downloaded)
+
+
+def load_excel_cached(source, columns=None, cache_dir=CACHE_DIR, numeric=(), dates=(), drop=(), chunk_rows=CHUNK_ROWS):
+    """Load the workbook (or CSV / Parquet file) at ``source`` through the on-disk Parquet cache.
+
+    ``source`` is an http(s) URL or a local path.  It is only re-ingested when
+    its validator, or the ingest options, differ from the ones recorded next
+    to the cached file; ingestion streams it in chunks (see ``convert``).
+    ``columns`` restricts the load to a subset of columns.  The returned frame
+    carries the validator in ``df.attrs["source_version"]``.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    parquet_path, meta_path = _paths(source, cache_dir)
+    meta = _read_meta(meta_path)
+    validator = source_validator(source)
+    ingest = {"numeric": sorted(numeric), "dates": sorted(dates), "drop": sorted(drop)}
+
+    # A validator without any identifying header can't prove the cached copy current
+    fresh = (meta is not None and os.path.exists(parquet_path) and meta.get("ingest") == ingest
+             and (validator is None or (any(validator.values()) and meta.get("validator") == validator)))
+    perf.hit("data_cache", fresh)
+    if not fresh:
+        if validator is None:
+            if not os.path.exists(parquet_path):
+                raise OSError(f"Cannot reach {source} and no cached copy exists")
+            meta = meta or {}  # can't re-ingest an unreachable source; serve the cached copy as-is
+        else:
+            with perf.span("ingest", source=_slug(source)):
+                convert(source, parquet_path, numeric, dates, drop, chunk_rows)
+            meta = {"source": source, "validator": validator, "ingest": ingest}
+            _atomic_write(meta_path, lambda tmp: _write_json(tmp, meta))
+
+    with perf.span("read_parquet", source=_slug(source)):
+        df = pd.read_parquet(parquet_path, columns=columns, memory_map=True)
+    df.attrs["source_version"] = _version_string(meta.get("validator"), parquet_path)
+    return df
+
+
+def _write_json(path, payload):
+    with open(path, "w") as f:
+        json.dump(payload, f)
+
+
+def _version_string(validator, parquet_path):
+    version = validator and (validator.get("etag") or validator.get("last_modified"))
+    # Without a validator, fall back to when the cached copy was written
+    return version or f"cached-{os.stat(parquet_path).st_mtime_ns}"
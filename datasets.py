@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+from functools import cached_property
+
+import pandas as pd
+
+import anomalies
+import frames
+import participant_store
+import perf
+import query_engine
+import rollup
+from filter_index import FilterIndex
+
+# -------------------------------
+# 🧹 Prepared datasets shared by both dashboards
+# -------------------------------
+# The raw workbooks are coerced and enriched once per load instead of on every
+# Streamlit rerun.  Prepared frames are shared between sessions without
+# copying, so they must be treated as read-only; with Copy-on-Write enabled a
+# consumer that does assign into a slice gets its own copy and never touches
+# the shared frame.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Bumped whenever the prepared layout changes, so stale shared copies are rebuilt
+FORMAT_VERSION = 1
+
+# Low-cardinality dimension columns stored as categoricals
+DIMENSION_COLS = ["OrganizationName", "CohortName", "ProgramName", "PhysicianName",
+                  "ParticipantGender", "AgeGroup", "Ethnicity", "City"]
+
+# The organisation hierarchy the charts and reports group by; the rollup cubes are keyed on these
+HIERARCHY_COLS = ["OrganizationName", "CohortName", "ProgramName", "PhysicianName"]
+
+# Columns the sidebar filters can select on
+FILTER_COLS = DIMENSION_COLS + ["ParticipantName"]
+
+ACTIVITY_NUMERIC_COLS = ["Steps", "DistanceInMeters", "Calories", "VigorousIntensityDurationInSeconds",
+                         "ModerateIntensityDurationInSeconds", "SedentaryDurationInSeconds",
+                         "LightIntensityDurationInSeconds"]
+
+SLEEP_NUMERIC_COLS = ["DurationInSeconds", "DeepSleep", "LightSleep", "RemSleep", "AwakeTime", "TimeSpent",
+                      "DurationAsleep"]
+
+INTENSITY_COLS = ["VigorousIntensityDurationInSeconds", "ModerateIntensityDurationInSeconds",
+                  "LightIntensityDurationInSeconds", "SedentaryDurationInSeconds"]
+
+SLEEP_STAGE_COLS = ["DeepSleep", "LightSleep", "RemSleep", "AwakeTime"]
+
+# How each source is typed while it is ingested (data_cache.load_excel_cached); other columns are kept
+# as text.  Race and Country aren't used by any chart or filter, so they are never stored.
+UNUSED_COLS = ["Race", "Country"]
+INGEST = {
+    "activity": {"numeric": ACTIVITY_NUMERIC_COLS, "dates": ["RecordDate", "StartTimeOffsetFormatted"],
+                 "drop": UNUSED_COLS},
+    "sleep": {"numeric": SLEEP_NUMERIC_COLS, "dates": ["RecordDate", "Start"], "drop": UNUSED_COLS},
+}
+
+# Rollup cubes materialised per dataset: cube name -> (key columns, measures).
+# Keying on the demographic columns too would leave about one cell per row, so
+# demographic filters are answered from the raw rows (via the filter index) instead.
+ROLLUPS = {
+    "activity": {
+        "daily": (["RecordDate", "DayOfWeek"] + HIERARCHY_COLS,
+                  ["Steps", "DistanceInMeters", "Calories"] + INTENSITY_COLS),
+        "timeslot": (["TimeSlot"] + HIERARCHY_COLS, ["Steps"]),
+    },
+    "sleep": {
+        "daily": (["RecordDate"] + HIERARCHY_COLS,
+                  ["DurationInSeconds", "SleepEfficiency"] + SLEEP_STAGE_COLS),
+    },
+}
+
+# Per-participant daily series for the drilldown view: dataset -> (how days are rolled up, columns)
+PARTICIPANT_SERIES = {
+    "activity": ("sum", ["Steps", "DistanceInMeters", "Calories"] + INTENSITY_COLS),
+    "sleep": ("mean", ["DurationInSeconds", "DurationAsleep", "TimeSpent", "SleepEfficiency"] + SLEEP_STAGE_COLS),
+}
+
+TIME_SLOT_BINS = [0, 2, 4, 6, 8, 10, 12, 14, 16, 18, 20, 22, 24]
+TIME_SLOT_LABELS = ["00-02", "02-04", "04-06", "06-08", "08-10", "10-12",
+                    "12-14", "14-16", "16-18", "18-20", "20-22", "22-00"]
+
+
+@dataclass(frozen=True)
+class PreparedDataset:
+    """A typed, enriched frame plus the source revision it was built from."""
+
+    name: str
+    frame: pd.DataFrame
+    version: str
+
+    # Derived structures are built on first use and live exactly as long as the frame
+    @cached_property
+    def filter_index(self):
+        with perf.span("filter_index", dataset=self.name):
+            return FilterIndex(self.frame, FILTER_COLS)
+
+    @cached_property
+    def rollups(self):
+        with perf.span("rollups", dataset=self.name):
+            return {name: rollup.RollupCube(self.frame, keys, measures)
+                    for name, (keys, measures) in ROLLUPS.get(self.name, {}).items()}
+
+    @cached_property
+    def anomalies(self):
+        """Per-row anomaly flags (activity only), aligned with ``frame``."""
+        with perf.span("anomalies", dataset=self.name):
+            return anomalies.detect(self.frame)
+
+    @cached_property
+    def participant_series(self):
+        """Daily series per participant, sorted by ParticipantName and RecordDate."""
+        with perf.span("participant_series", dataset=self.name):
+            return participant_store.build(self.frame, *PARTICIPANT_SERIES[self.name])
+
+    @cached_property
+    def participant_index(self):
+        return participant_store.SeriesIndex(self.participant_series)
+
+    def rows(self, filters):
+        """The prepared rows matching every ``{column: value}`` in ``filters``."""
+        return self.filter_index.take(self.frame, self.filter_index.select(filters))
+
+    # Counting, distinct values and aggregations go through the configured query engine.
+    # The sidebar filters are shared by both datasets, so filters on columns this one lacks are ignored.
+
+    def _applicable(self, filters):
+        return {column: value for column, value in filters.items() if column in self.frame.columns}
+
+    def count(self, filters):
+        """Number of prepared rows matching ``filters``."""
+        return query_engine.get().count(self, self._applicable(filters))
+
+    def distinct(self, column, filters):
+        """Sorted distinct non-null values of ``column`` among the rows matching ``filters``."""
+        return query_engine.get().distinct(self, column, self._applicable(filters))
+
+    def aggregate(self, cube, filters, by, measures, how="sum"):
+        """``measures`` aggregated (``"sum"`` or ``"mean"``) by ``by`` over the rows matching ``filters``.
+
+        ``cube`` names the rollup cube the pandas engine answers from when it covers the query.
+        """
+        return query_engine.get().aggregate(self, cube, self._applicable(filters), by, measures, how)
+
+    def updated(self, keep, delta, version):
+        """This dataset with the rows where ``keep`` is False dropped and the prepared ``delta`` appended.
+
+        Derived structures that have already been built are updated from the
+        changed rows instead of being rebuilt from the whole frame.
+        """
+        frame = frames.concat_frames([self.frame[keep], delta.frame])
+        dataset = PreparedDataset(self.name, frame, version)
+        if "filter_index" in self.__dict__:
+            dataset.__dict__["filter_index"] = self.filter_index.updated(keep, delta.frame)
+        removed = self.frame[~keep]
+        if "rollups" in self.__dict__:
+            dataset.__dict__["rollups"] = {name: cube.updated(removed, delta.frame)
+                                           for name, cube in self.rollups.items()}
+        changed = set(delta.frame["ParticipantName"]) | set(removed["ParticipantName"])
+        if "anomalies" in self.__dict__:
+            dataset.__dict__["anomalies"] = anomalies.updated(self.anomalies, keep, frame, changed)
+        if "participant_series" in self.__dict__:
+            dataset.__dict__["participant_series"] = participant_store.updated(
+                self.participant_series, frame, *PARTICIPANT_SERIES[self.name], changed)
+        return dataset
+
+    def derived(self):
+        """The derived structures built so far, keyed by attribute name."""
+        return {name: value for name, value in self.__dict__.items() if name not in ("name", "frame", "version")}
+
+
+def _categorize(df, cols):
+    for col in cols:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
+
+def _source_version(raw):
+    return raw.attrs.get("source_version", "unknown")
+
+
+def row_hashes(raw):
+    """One 64-bit hash per raw row, used to detect new and changed records between snapshots."""
+    return pd.util.hash_pandas_object(raw, index=False).to_numpy()
+
+
+@perf.timed("prepare_activity")
+def prepare_activity(raw):
+    df = raw.copy()
+    df["RowHash"] = row_hashes(raw)
+    df[ACTIVITY_NUMERIC_COLS] = df[ACTIVITY_NUMERIC_COLS].apply(pd.to_numeric, errors="coerce")
+    df["RecordDate"] = pd.to_datetime(df["RecordDate"], errors="coerce")
+    df["StartTimeFormatted"] = pd.to_datetime(df["StartTimeOffsetFormatted"], errors="coerce")
+    df["ParticipantName"] = df["LastName"] + " " + df["FirstName"]
+
+    # Derived columns used by the time-of-day heatmap and weekly trends
+    df["Hour"] = df["StartTimeFormatted"].dt.hour
+    df["TimeSlot"] = pd.cut(df["Hour"], bins=TIME_SLOT_BINS, labels=TIME_SLOT_LABELS)
+    df["DayOfWeek"] = df["RecordDate"].dt.day_name()
+
+    _categorize(df, DIMENSION_COLS + ["AnomalyType", "DayOfWeek"])
+    return PreparedDataset("activity", df, _source_version(raw))
+
+
+@perf.timed("prepare_sleep")
+def prepare_sleep(raw):
+    df = raw.copy()
+    df["RowHash"] = row_hashes(raw)
+    df[SLEEP_NUMERIC_COLS] = df[SLEEP_NUMERIC_COLS].apply(pd.to_numeric, errors="coerce")
+    df["Start"] = pd.to_datetime(df["Start"], errors="coerce")
+    df["RecordDate"] = pd.to_datetime(df["RecordDate"], errors="coerce")
+    df["ParticipantName"] = df["LastName"] + " " + df["FirstName"]
+
+    # Ensure AgeGroup is treated as a string
+    df["AgeGroup"] = df["AgeGroup"].astype(str)
+
+    df["SleepEfficiency"] = ((df["DurationAsleep"] / df["TimeSpent"]) * 100).round(2)
+
+    _categorize(df, DIMENSION_COLS)
+    return PreparedDataset("sleep", df, _source_version(raw))
@@ -0,0 +1,99 @@
+import plotly.express as px
+import streamlit as st
+
+import chart_units
+import datasets
+import image_cache
+import loader
+import participant_store
+
+# -------------------------------
+# 🔎 Single-participant drilldown
+# -------------------------------
+# Shown instead of the full dashboards when one participant is selected.  Every
+# chart reads that participant's precomputed daily series (participant_store)
+# by offset lookup, with activity and sleep side by side.
+
+# Chart units: functions of (dataset, filters) like the dashboards', memoized by chart_units
+
+def _series(dataset, filters):
+    return participant_store.series(dataset, filters["ParticipantName"])
+
+def _line_chart(dataset, filters, column, title, label):
+    series = _series(dataset, filters)
+    if series.empty:
+        return None
+    return px.line(series, x="RecordDate", y=column, markers=True, title=title,
+                   labels={column: label, "RecordDate": "Date"})
+
+def _stacked_chart(dataset, filters, columns, title, label, legend):
+    series = _series(dataset, filters)
+    if series.empty:
+        return None
+    return px.bar(series, x="RecordDate", y=columns, title=title,
+                  labels={"value": label, "variable": legend, "RecordDate": "Date"}, barmode="stack")
+
+def steps_chart(dataset, filters):
+    return _line_chart(dataset, filters, "Steps", "Daily Steps", "Steps")
+
+def distance_chart(dataset, filters):
+    return _line_chart(dataset, filters, "DistanceInMeters", "Daily Distance", "Distance (Meters)")
+
+def calories_chart(dataset, filters):
+    return _line_chart(dataset, filters, "Calories", "Daily Calories Burned", "Calories")
+
+def intensity_chart(dataset, filters):
+    return _stacked_chart(dataset, filters, datasets.INTENSITY_COLS, "Daily Activity Intensity",
+                          "Duration (Seconds)", "Activity Intensity")
+
+def sleep_duration_chart(dataset, filters):
+    return _line_chart(dataset, filters, "DurationInSeconds", "Nightly Sleep Duration", "Sleep (Seconds)")
+
+def sleep_stages_chart(dataset, filters):
+    return _stacked_chart(dataset, filters, datasets.SLEEP_STAGE_COLS, "Nightly Sleep Stages",
+                          "Duration (Seconds)", "Sleep Stage")
+
+def sleep_efficiency_chart(dataset, filters):
+    return _line_chart(dataset, filters, "SleepEfficiency", "Nightly Sleep Efficiency", "Sleep Efficiency (%)")
+
+ACTIVITY_CHARTS = [
+    ("drilldown_steps", steps_chart, "Steps"),
+    ("drilldown_distance", distance_chart, "Distance"),
+    ("drilldown_calories", calories_chart, "Calories"),
+    ("drilldown_intensity", intensity_chart, "Activity Intensity"),
+]
+
+SLEEP_CHARTS = [
+    ("drilldown_sleep_duration", sleep_duration_chart, "Sleep Duration"),
+    ("drilldown_sleep_stages", sleep_stages_chart, "Sleep Stages"),
+    ("drilldown_sleep_efficiency", sleep_efficiency_chart, "Sleep Efficiency"),
+]
+
+
+def _column(dataset, filters, charts, empty_message):
+    if dataset is None:
+        st.error("Failed to load data from S3.")
+        return
+    if _series(dataset, filters).empty:
+        st.info(empty_message)
+        return
+    for chart_id, build, subheader in charts:
+        chart_units.plotly_unit(chart_id, dataset, filters, build, subheader, empty_message, key=chart_id)
+
+
+def main(selection):
+    participant = selection.filters["ParticipantName"]
+    st.title(f"Participant: {participant} 🔎")
+    filters = {"ParticipantName": participant}
+
+    # The participant pins down their physician even when no physician filter is set
+    image_cache.show_photos(selection, physician=selection.filters.get("PhysicianName", "Assigned physician"),
+                            participant=participant)
+
+    activity_col, sleep_col = st.columns(2)
+    with activity_col:
+        st.header("Activity 🏃‍♂️")
+        _column(loader.get("activity"), filters, ACTIVITY_CHARTS, "No activity data for this participant.")
+    with sleep_col:
+        st.header("Sleep 💤")
+        _column(loader.get("sleep"), filters, SLEEP_CHARTS, "No sleep data for this participant.")
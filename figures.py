@@ -0,0 +1,74 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import perf
+
+# -------------------------------
+# 🖼️ Cached matplotlib / seaborn rendering
+# -------------------------------
+# Figures are explicit Figure objects on their own Agg canvas; nothing goes
+# through pyplot's global figure registry, and every figure is cleared as soon
+# as it has been rasterised.  The PNG bytes are cached on a fingerprint of the
+# aggregated input, so an unchanged chart is never drawn twice.  Matplotlib
+# only guarantees thread safety per figure, so drawing itself is serialised.
+
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+_images = OrderedDict()
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+_render_lock = threading.Lock()
+
+
+def fingerprint(data):
+    """Stable digest of a Series/DataFrame (values, index and labels)."""
+    digest = hashlib.sha1()
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr(list(data.columns)).encode())
+    elif isinstance(data, pd.Series):
+        digest.update(repr(data.name).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def render_png(chart_id, data, draw, figsize, dpi=100):
+    """PNG bytes for ``draw(ax, data)`` on a fresh ``figsize`` figure, cached per input."""
+    key = (chart_id, fingerprint(data), tuple(figsize), dpi)
+    with _cache_lock:
+        if key in _images:
+            _images.move_to_end(key)
+            perf.hit("figures", True)
+            return _images[key]
+    perf.hit("figures", False)
+
+    with _render_lock, perf.span("render_png", chart=chart_id):
+        fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(fig)
+        try:
+            draw(fig.add_subplot(), data)
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", bbox_inches="tight")
+        finally:
+            fig.clear()
+    png = buffer.getvalue()
+    perf.payload(chart_id, len(png), "png")
+    _store(key, png)
+    return png
+
+
+def _store(key, png):
+    global _cache_bytes
+    with _cache_lock:
+        if key in _images:
+            return
+        _images[key] = png
+        _cache_bytes += len(png)
+        while _cache_bytes > MAX_CACHE_BYTES and len(_images) > 1:
+            _, evicted = _images.popitem(last=False)
+            _cache_bytes -= len(evicted)
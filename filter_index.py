@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# 🗂️ Dimension index for the cascading sidebar filters
+# -------------------------------
+# Built once per dataset load.  Every indexed column is factorised into sorted
+# integer codes, and the row positions are grouped by code (a stable argsort
+# plus per-code offsets).  A selection is then a sorted array of row positions:
+# the first filter takes its group slice, every further filter keeps only the
+# candidate rows whose code matches.  Option lists come from the codes present
+# in the current selection, so no rerun scans or re-sorts the DataFrame.
+
+
+class FilterIndex:
+    def __init__(self, frame, columns):
+        self.n_rows = len(frame)
+        self.columns = [col for col in columns if col in frame.columns]
+        self._codes = {}
+        self._labels = {}
+        self._lookup = {}
+        self._order = {}
+        self._offsets = {}
+        for col in self.columns:
+            codes, uniques = pd.factorize(frame[col], sort=True)
+            self._set(col, np.asarray(codes, dtype=np.int64), list(uniques))
+
+    def _set(self, col, codes, labels):
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes + 1, minlength=len(labels) + 1)
+        self._codes[col] = codes
+        self._labels[col] = labels
+        self._lookup[col] = {label: code for code, label in enumerate(labels)}
+        self._order[col] = order
+        # offsets[code + 1] is where the rows for ``code`` start; missing values (-1) come first
+        self._offsets[col] = np.concatenate([[0], np.cumsum(counts)])
+
+    def updated(self, keep, delta):
+        """A new index for ``frame[keep]`` followed by the rows of ``delta``.
+
+        Only the delta rows are factorised; the kept rows reuse their codes,
+        remapped when the delta introduces new values.
+        """
+        index = FilterIndex.__new__(FilterIndex)
+        index.n_rows = int(np.count_nonzero(keep)) + len(delta)
+        index.columns = list(self.columns)
+        index._codes, index._labels, index._lookup, index._order, index._offsets = {}, {}, {}, {}, {}
+        for col in self.columns:
+            delta_codes, delta_uniques = pd.factorize(delta[col], sort=True)
+            old_labels = self._labels[col]
+            new_values = [value for value in delta_uniques if value not in self._lookup[col]]
+            labels = sorted(old_labels + new_values) if new_values else old_labels
+            lookup = {label: code for code, label in enumerate(labels)}
+            # Map old codes and delta codes into the merged label space; -1 (missing) stays -1
+            old_map = np.array([-1] + [lookup[label] for label in old_labels], dtype=np.int64)
+            delta_map = np.array([-1] + [lookup[value] for value in delta_uniques], dtype=np.int64)
+            codes = np.concatenate([old_map[self._codes[col][keep] + 1], delta_map[np.asarray(delta_codes) + 1]])
+            index._set(col, codes, labels)
+        return index
+
+    def rows(self, column, value):
+        """Sorted row positions where ``column == value``."""
+        code = self._lookup[column].get(value)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        offsets = self._offsets[column]
+        return self._order[column][offsets[code + 1]:offsets[code + 2]]
+
+    def refine(self, rows, column, value):
+        """Narrow a selection (``None`` means all rows) to ``column == value``."""
+        if rows is None:
+            return self.rows(column, value)
+        code = self._lookup[column].get(value)
+        if code is None:
+            return rows[:0]
+        return rows[self._codes[column][rows] == code]
+
+    def select(self, filters):
+        """Row positions matching every ``{column: value}`` in ``filters``, or ``None`` for all rows.
+
+        Filters on columns the index does not have (not in this dataset) are ignored.
+        """
+        filters = {column: value for column, value in filters.items() if column in self._lookup}
+        if not filters:
+            return None
+        # Start from the smallest group so the remaining checks touch as few rows as possible
+        items = sorted(filters.items(), key=lambda item: len(self.rows(*item)))
+        rows = None
+        for column, value in items:
+            rows = self.refine(rows, column, value)
+        return rows
+
+    def options(self, column, rows=None):
+        """Sorted distinct non-null values of ``column`` within a selection."""
+        labels = self._labels[column]
+        if rows is None:
+            present = np.diff(self._offsets[column])[1:]
+        else:
+            present = np.bincount(self._codes[column][rows] + 1, minlength=len(labels) + 1)[1:]
+        return [labels[code] for code in np.flatnonzero(present)]
+
+    def take(self, frame, rows):
+        """The rows of ``frame`` (the frame the index was built from) in a selection."""
+        return frame if rows is None else frame.iloc[rows]
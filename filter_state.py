@@ -0,0 +1,51 @@
+import streamlit as st
+
+import perf
+
+# -------------------------------
+# 🎛️ Sidebar filter state shared across pages
+# -------------------------------
+# The selections live in st.session_state under SESSION_KEY rather than in the
+# widgets of one page, so the organization, cohort, physician, participant and
+# demographic picks survive switching between dashboards.  Option lists come
+# from the participant master table (participants.py); a stored selection that
+# is no longer offered under the selections above it falls back to "All".
+
+SESSION_KEY = "shared_filters"
+
+# Organization → Cohort → Program → Physician → Gender → Age Group → Ethnicity → City → Participant
+FILTER_CHAIN = [
+    ("OrganizationName", "Select Organization"),
+    ("CohortName", "Select Cohort"),
+    ("ProgramName", "Select Program"),
+    ("PhysicianName", "Select Physician"),
+    ("ParticipantGender", "Select Gender"),
+    ("AgeGroup", "Select Age Group"),
+    ("Ethnicity", "Select Ethnicity"),
+    ("City", "Select City"),
+    ("ParticipantName", "Select Participant"),
+]
+
+
+def sidebar(master):
+    """Draw the cascading filters for ``master`` and return the resolved selection."""
+    st.sidebar.header("Filter Data")
+    stored = st.session_state.setdefault(SESSION_KEY, {})
+
+    with perf.span("filters", page="shared"):
+        resolution = master.resolve(stored, FILTER_CHAIN)
+        filters = {}
+        for position, (column, label) in enumerate(FILTER_CHAIN):
+            options = ["All"] + resolution.options[column]
+            current = stored.get(column, "All")
+            selected = st.sidebar.selectbox(label, options, index=options.index(current) if current in options else 0)
+            if selected != "All":
+                filters[column] = selected
+            if selected != current:
+                # Changed (or no longer offered): the option lists below depend on it, so resolve again
+                below = {c for c, _ in FILTER_CHAIN[position + 1:]}
+                stored = {**filters, **{c: v for c, v in stored.items() if c in below}}
+                resolution = master.resolve(stored, FILTER_CHAIN)
+        st.session_state[SESSION_KEY] = filters
+    st.sidebar.caption(f"{resolution.rows['ParticipantName'].nunique()} participants selected")
+    return resolution
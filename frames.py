@@ -0,0 +1,38 @@
+import pandas as pd
+
+# -------------------------------
+# 🧱 Small DataFrame helpers shared by the dataset layers
+# -------------------------------
+
+
+def concat_frames(frames):
+    """Concatenate frames row-wise, keeping categorical columns categorical.
+
+    ``pd.concat`` falls back to object dtype when the categoricals of the parts
+    have different categories; here the categories are unioned (sorted, unless
+    the column is ordered, in which case the first frame's order is kept).
+    """
+    frames = [frame for frame in frames if frame is not None]
+    if len(frames) == 1:
+        return frames[0]
+    aligned = [frame.copy(deep=False) for frame in frames]
+    for col in frames[0].columns:
+        dtypes = [frame[col].dtype for frame in frames if col in frame.columns]
+        if not all(isinstance(dtype, pd.CategoricalDtype) for dtype in dtypes):
+            continue
+        first = dtypes[0]
+        if first.ordered:
+            categories = list(first.categories)
+            seen = set(categories)
+            for dtype in dtypes[1:]:
+                for category in dtype.categories:
+                    if category not in seen:
+                        seen.add(category)
+                        categories.append(category)
+        else:
+            categories = sorted({c for dtype in dtypes for c in dtype.categories})
+        union = pd.CategoricalDtype(categories, ordered=first.ordered)
+        for frame in aligned:
+            if col in frame.columns:
+                frame[col] = frame[col].astype(union)
+    return pd.concat(aligned, ignore_index=True)
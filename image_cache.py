@@ -0,0 +1,178 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+from PIL import Image
+
+import data_cache
+import perf
+
+# -------------------------------
+# 🖼️ Physician / participant photo cache
+# -------------------------------
+# Photos are fetched once (with a timeout, several at a time), shrunk to the
+# width they are displayed at and kept as small thumbnails in a size-bounded
+# LRU in memory and on disk.  Reruns and other sessions get the cached bytes
+# instead of making the browser load the full-size remote image again.  Failed
+# fetches are remembered for a while so a dead link isn't retried every rerun.
+
+THUMBNAIL_WIDTH = 150
+FETCH_TIMEOUT = 5
+MAX_MEMORY_BYTES = 16 * 1024 * 1024
+MAX_DISK_BYTES = 64 * 1024 * 1024
+FAILURE_TTL = 300
+CACHE_DIR = os.path.join(data_cache.CACHE_DIR, "images")
+
+_memory = OrderedDict()
+_memory_bytes = 0
+_failures = {}
+_inflight = {}
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="image-cache")
+
+
+def clean_url(value):
+    """Photo URL from a workbook cell (stripped of stray quotes), or ``None``."""
+    if pd.isna(value):
+        return None
+    return str(value).strip().strip("'") or None
+
+
+def _key(url, width):
+    return hashlib.sha1(f"{width}:{url}".encode()).hexdigest()
+
+
+def _fetch(url):
+    # Photo URLs come from workbook cells, so anything but http(s) (local paths, file://) is refused
+    if not url.lower().startswith(("http://", "https://")):
+        raise ValueError(f"Unsupported photo URL scheme: {url!r}")
+    request = urllib.request.Request(url, headers={"User-Agent": "altascio-dashboard"})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+        return response.read()
+
+
+def _thumbnail(raw, width):
+    with Image.open(io.BytesIO(raw)) as image:
+        image.thumbnail((width, width * 10))
+        has_alpha = image.mode in ("RGBA", "LA", "P")
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        out = io.BytesIO()
+        image.save(out, format="PNG" if has_alpha else "JPEG", quality=85)
+    return out.getvalue()
+
+
+def _remember(key, data):
+    global _memory_bytes
+    with _lock:
+        if key in _memory:
+            return
+        _memory[key] = data
+        _memory_bytes += len(data)
+        while _memory_bytes > MAX_MEMORY_BYTES and len(_memory) > 1:
+            _, evicted = _memory.popitem(last=False)
+            _memory_bytes -= len(evicted)
+
+
+def _disk_get(key):
+    path = os.path.join(CACHE_DIR, key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    os.utime(path)  # mtime doubles as the LRU clock
+    return data
+
+
+def _disk_put(key, data):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = os.path.join(CACHE_DIR, f".{key}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, os.path.join(CACHE_DIR, key))
+
+    entries = []
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file() and not entry.name.startswith("."):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= MAX_DISK_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _load(url, width, key):
+    try:
+        data = _disk_get(key)
+        if data is None:
+            data = _thumbnail(_fetch(url), width)
+            _disk_put(key, data)
+        _remember(key, data)
+        return data
+    except Exception:
+        with _lock:
+            _failures[key] = time.time()
+        return None
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+def thumbnails(urls, width=THUMBNAIL_WIDTH):
+    """``{url: thumbnail bytes or None}`` for ``urls``, fetching the missing ones concurrently."""
+    results, futures = {}, {}
+    for url in dict.fromkeys(url for url in urls if url):
+        key = _key(url, width)
+        with _lock:
+            if key in _memory:
+                _memory.move_to_end(key)
+                results[url] = _memory[key]
+                perf.hit("image_cache", True)
+                continue
+            if time.time() - _failures.get(key, 0) < FAILURE_TTL:
+                results[url] = None
+                continue
+            perf.hit("image_cache", False)
+            future = _inflight.get(key)
+            if future is None:
+                future = _inflight[key] = _executor.submit(_load, url, width, key)
+        futures[url] = future
+    for url, future in futures.items():
+        results[url] = future.result()
+    return results
+
+
+def thumbnail(url, width=THUMBNAIL_WIDTH):
+    """Thumbnail bytes for a single ``url``, or ``None`` when it can't be fetched."""
+    return thumbnails([url], width).get(url)
+
+
+def show_photos(selection, physician=None, participant=None, width=THUMBNAIL_WIDTH):
+    """Show the physician and participant photos of the resolved ``selection`` side by side.
+
+    ``physician`` / ``participant`` are the captions' names; a photo whose name
+    is ``None`` isn't shown.  Both thumbnails are fetched together.
+    """
+    physician_photo = clean_url(selection.photo("PhysicianPhoto")) if physician is not None else None
+    participant_photo = clean_url(selection.photo("ParticipantPhotoURL")) if participant is not None else None
+    photos = thumbnails([physician_photo, participant_photo], width=width)
+    col1, col2 = st.columns([1, 1])
+    if photos.get(physician_photo):
+        with col1:
+            st.image(photos[physician_photo], caption=f"Physician: {physician}", width=width)
+    if photos.get(participant_photo):
+        with col2:
+            st.image(photos[participant_photo], caption=f"Participant: {participant}", width=width)
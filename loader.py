@@ -0,0 +1,99 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import perf
+import shared_store
+
+# -------------------------------
+# ⏳ Background prefetch with stale-while-revalidate
+# -------------------------------
+# Dashboards register how to build their dataset; the loader warms every
+# registered dataset concurrently on the first script run of the process and
+# refreshes them on a thread pool.  A request always gets the last good published copy straight away.
+# When that copy is older than MAX_AGE a background refresh is started, and
+# the new version replaces it atomically once shared_store publishes it.
+# A version published by another worker is mapped, and its filter index and
+# rollups built, on the loader thread; requests keep the previous copy until
+# then.  Only the very first load of a process with nothing published yet waits,
+# and callers that can do without a dataset can ask not to (``wait=False``).
+
+MAX_AGE = 1800
+
+logger = logging.getLogger(__name__)
+
+_builders = {}
+_pending = {}
+_served = {}  # name -> (published version, dataset ready to serve)
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="dataset-loader")
+_warmed = False
+
+
+def register(name, build):
+    """Register ``build()`` (returning a PreparedDataset) as the loader for dataset ``name``."""
+    _builders[name] = build
+
+
+def _load(name):
+    try:
+        with perf.span("load", dataset=name):
+            dataset = shared_store.attach(name, _builders[name], max_age=MAX_AGE)
+            if dataset is None:
+                return None
+            version = shared_store.attached_version(name)
+            # Built here rather than lazily by the first request that filters the new copy
+            dataset.filter_index
+            dataset.rollups
+    except Exception:
+        logger.exception("Refreshing dataset %s failed", name)
+        return None
+    with _lock:
+        _served[name] = (version, dataset)
+    return dataset
+
+
+def refresh(name):
+    """Start a background refresh of ``name`` unless one is already running; returns its future."""
+    with _lock:
+        future = _pending.get(name)
+        if future is None or future.done():
+            future = _executor.submit(_load, name)
+            _pending[name] = future
+        return future
+
+
+def warm():
+    """Start loading every registered dataset concurrently (once per process)."""
+    global _warmed
+    with _lock:
+        if _warmed:
+            return
+        _warmed = True
+    for name in _builders:
+        refresh(name)
+
+
+def get(name, wait=True):
+    """The last good copy of ``name``, refreshing it in the background when it is stale.
+
+    Before the first load of the process has finished, waits for it, or returns
+    ``None`` straight away when ``wait`` is False.
+    """
+    with _lock:
+        served = _served.get(name)
+    perf.hit("loader", served is not None)
+    if served is None:
+        # Nothing has been loaded in this process yet; wait for the in-flight load
+        future = refresh(name)
+        return future.result() if wait else None
+    version, dataset = served
+    pointer = shared_store.read_pointer(name)
+    if pointer is not None and pointer["version"] != version:
+        # Published by another worker; served from the previous copy until it is mapped and indexed
+        perf.count("loader.moved")
+        refresh(name)
+    elif shared_store.needs_refresh(name, MAX_AGE):
+        perf.count("loader.stale")
+        refresh(name)
+    return dataset
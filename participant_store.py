@@ -0,0 +1,56 @@
+import numpy as np
+
+import frames
+
+# -------------------------------
+# 🧍 Per-participant daily series for the drilldown view
+# -------------------------------
+# Built once when a dataset is loaded: the prepared rows are rolled up to one
+# row per participant and RecordDate and stored sorted by (ParticipantName,
+# RecordDate).  A participant's series is then a contiguous slice found by an
+# offset lookup, so the single-participant view never scans or filters the
+# full frame.  The sorted frame is published with the dataset like the
+# anomaly flags; the offsets are rebuilt from it in one pass.  Which columns
+# each dataset keeps, and how days are rolled up, is datasets.PARTICIPANT_SERIES.
+
+
+def build(frame, how, columns, participants=None):
+    """Daily ``how`` ("sum" / "mean") of ``columns`` sorted by participant and date (only ``participants`` when given)."""
+    if participants is not None:
+        frame = frame[frame["ParticipantName"].isin(participants).to_numpy()]
+    columns = [col for col in columns if col in frame.columns]
+    grouped = frame.groupby(["ParticipantName", "RecordDate"], sort=True)[columns]
+    series = grouped.sum() if how == "sum" else grouped.mean()
+    return series.reset_index()
+
+
+def updated(previous, frame, how, columns, changed_participants):
+    """``previous`` series with ``changed_participants`` rebuilt from ``frame``."""
+    changed = previous["ParticipantName"].isin(changed_participants).to_numpy()
+    rebuilt = build(frame, how, columns, changed_participants)
+    merged = frames.concat_frames([previous[~changed], rebuilt])
+    return merged.sort_values(["ParticipantName", "RecordDate"], kind="stable", ignore_index=True)
+
+
+class SeriesIndex:
+    """Offsets of each participant's rows in a sorted series frame."""
+
+    def __init__(self, series):
+        self.series = series
+        names = series["ParticipantName"].to_numpy()
+        # The frame is sorted, so each participant's rows start where the name changes
+        starts = np.flatnonzero(np.r_[True, names[1:] != names[:-1]]) if len(names) else np.empty(0, dtype=np.int64)
+        self._offsets = np.r_[starts, len(names)]
+        self._lookup = {names[start]: i for i, start in enumerate(starts)}
+
+    def get(self, participant):
+        """The daily series of ``participant`` (empty when unknown)."""
+        i = self._lookup.get(participant)
+        if i is None:
+            return self.series.iloc[:0]
+        return self.series.iloc[self._offsets[i]:self._offsets[i + 1]]
+
+
+def series(dataset, participant):
+    """The daily series of ``participant`` in ``dataset``, by offset lookup."""
+    return dataset.participant_index.get(participant)
@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+
+import pandas as pd
+
+import datasets
+import frames
+import loader
+import perf
+from filter_index import FilterIndex
+
+# -------------------------------
+# 👥 Participant master table shared by both dashboards
+# -------------------------------
+# Activity and sleep carry the same dimension columns, so the sidebar filters
+# are resolved against one small table with a row per distinct participant and
+# dimension combination, built from both prepared datasets.  A selection is
+# resolved once (option lists for every filter plus the matching master rows)
+# and memoized per master version, so switching pages or re-running with
+# the same selection reuses the resolution instead of scanning either dataset.
+
+DATASETS = ["activity", "sleep"]
+PHOTO_COLS = ["PhysicianPhoto", "ParticipantPhotoURL"]
+MAX_RESOLUTIONS = 256
+
+_masters = {}
+_masters_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Resolution:
+    """A filter selection resolved against the master table."""
+
+    filters: dict
+    options: dict
+    rows: pd.DataFrame
+
+    def photo(self, column):
+        """The photo URL in ``column`` when the selection pins down a single value, else ``None``."""
+        values = self.rows[column].dropna().unique() if column in self.rows.columns else []
+        return values[0] if len(values) == 1 else None
+
+
+@dataclass(frozen=True)
+class ParticipantMaster:
+    frame: pd.DataFrame
+    version: tuple
+
+    @cached_property
+    def filter_index(self):
+        return FilterIndex(self.frame, datasets.FILTER_COLS)
+
+    @cached_property
+    def _resolutions(self):
+        return OrderedDict(), threading.Lock()
+
+    def options(self, column, filters):
+        """Sorted values of ``column`` present under ``filters``."""
+        index = self.filter_index
+        return index.options(column, index.select(filters))
+
+    def resolve(self, filters, chain):
+        """Option lists for each ``chain`` column (given the selections above it) and the matching master rows."""
+        key = (tuple(column for column, _ in chain), tuple(sorted((c, str(v)) for c, v in filters.items())))
+        memo, lock = self._resolutions
+        with lock:
+            if key in memo:
+                memo.move_to_end(key)
+                perf.hit("participants", True)
+                return memo[key]
+        perf.hit("participants", False)
+
+        options, above = {}, {}
+        for column, _ in chain:
+            options[column] = self.options(column, above)
+            if column in filters:
+                above[column] = filters[column]
+        index = self.filter_index
+        rows = index.take(self.frame, index.select(filters))
+        resolution = Resolution(dict(filters), options, rows)
+        with lock:
+            memo[key] = resolution
+            while len(memo) > MAX_RESOLUTIONS:
+                memo.popitem(last=False)
+        return resolution
+
+
+def _participant_rows(dataset):
+    frame = dataset.frame
+    keys = [col for col in datasets.FILTER_COLS if col in frame.columns]
+    photos = [col for col in PHOTO_COLS if col in frame.columns]
+    grouped = frame.groupby(keys, observed=True, dropna=False, sort=False)
+    table = grouped[photos].first() if photos else pd.DataFrame(index=grouped.size().index)
+    return table.assign(**{f"{dataset.name}_rows": grouped.size()}).reset_index()
+
+
+def build(prepared):
+    """The master table for the given prepared datasets (``None`` entries are skipped)."""
+    prepared = [dataset for dataset in prepared if dataset is not None]
+    with perf.span("participant_master", datasets=[dataset.name for dataset in prepared]):
+        parts = [_participant_rows(dataset) for dataset in prepared]
+        combined = frames.concat_frames(parts)
+        keys = [col for col in datasets.FILTER_COLS if col in combined.columns]
+        counts = [f"{dataset.name}_rows" for dataset in prepared]
+        photos = [col for col in PHOTO_COLS if col in combined.columns]
+        grouped = combined.groupby(keys, observed=True, dropna=False, sort=False)
+        frame = grouped[counts].sum().astype("int64").join(grouped[photos].first()).reset_index()
+    return ParticipantMaster(frame, tuple((dataset.name, dataset.version) for dataset in prepared))
+
+
+def current(required=DATASETS):
+    """The master table for the currently loaded datasets, or ``None`` when none has loaded.
+
+    Waits for the ``required`` datasets on a cold start; the others are
+    included once they have loaded, and the master is rebuilt then.
+    """
+    prepared = [loader.get(name, wait=name in required) for name in DATASETS]
+    if all(dataset is None for dataset in prepared):
+        return None
+    version = tuple((dataset.name, dataset.version) for dataset in prepared if dataset is not None)
+    with _masters_lock:
+        master = _masters.get(version)
+    if master is None:
+        master = build(prepared)
+        with _masters_lock:
+            _masters.clear()
+            _masters[version] = master
+    return master
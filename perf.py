@@ -0,0 +1,153 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# -------------------------------
+# 🔬 Hot-path instrumentation
+# -------------------------------
+# Stages of both dashboards run inside timing spans that record wall time and
+# the change in process RSS.  Loaders and caches bump hit/miss counters, and
+# chart units record the payload bytes they send to the browser.  Events go to
+# an in-memory ring buffer (shown by the debug panel in the app.py sidebar)
+# and to the "perf" logger as one JSON object per line; set DASHBOARD_PERF_LOG
+# to a path to also append them to a file.  DASHBOARD_PERF=0 turns it all off.
+#
+# Payload sizes cost a second serialisation of every new figure, so they are
+# only measured when asked for: DASHBOARD_PERF=1 set explicitly, or while the
+# debug panel is open in the running session (measure_payloads).
+#
+# Memory deltas are process-wide, so concurrent sessions and background
+# refreshes show up in each other's spans; read them as a rough guide.
+
+ENABLED = os.environ.get("DASHBOARD_PERF", "1") != "0"
+PAYLOADS = os.environ.get("DASHBOARD_PERF") == "1"
+MAX_EVENTS = 2000
+LOG_PATH = os.environ.get("DASHBOARD_PERF_LOG")
+
+logger = logging.getLogger("perf")
+if LOG_PATH:
+    _handler = logging.FileHandler(LOG_PATH)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_events = deque(maxlen=MAX_EVENTS)
+_counters = Counter()
+_lock = threading.Lock()
+_local = threading.local()
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes():
+    """Current resident set size of this process, or ``None`` where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _emit(event):
+    event = dict(event, ts=time.time(), thread=threading.current_thread().name)
+    with _lock:
+        _events.append(event)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(event, default=str))
+
+
+@contextmanager
+def span(name, **fields):
+    """Time the enclosed block as stage ``name``; nested spans record their parent."""
+    if not ENABLED:
+        yield
+        return
+    stack = _local.__dict__.setdefault("stack", [])
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        rss_after = rss_bytes()
+        stack.pop()
+        event = {"kind": "span", "name": name, "parent": parent, "seconds": round(seconds, 6),
+                 "rss_delta": None if rss_before is None or rss_after is None else rss_after - rss_before,
+                 "rss": rss_after, **fields}
+        if error:
+            event["error"] = error
+        _emit(event)
+
+
+def timed(name):
+    """Decorator form of ``span``."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1):
+    """Add ``n`` to counter ``name`` (e.g. "chart_units.hit")."""
+    if ENABLED:
+        with _lock:
+            _counters[name] += n
+
+
+def hit(cache, is_hit):
+    """Count a hit or a miss on ``cache``."""
+    count(f"{cache}.{'hit' if is_hit else 'miss'}")
+
+
+def measure_payloads(on):
+    """Measure chart payloads for the rest of this script run (the debug panel turns it on)."""
+    _local.payloads = on
+
+
+def payloads_enabled():
+    """True when chart payload sizes should be measured in the current thread."""
+    return ENABLED and (PAYLOADS or getattr(_local, "payloads", False))
+
+
+def payload(chart_id, nbytes, fmt):
+    """Record the serialised size of a chart sent to the browser."""
+    if ENABLED:
+        _emit({"kind": "payload", "name": chart_id, "bytes": int(nbytes), "format": fmt})
+
+
+def events(kind=None):
+    """A snapshot of the buffered events, oldest first."""
+    with _lock:
+        snapshot = list(_events)
+    return [event for event in snapshot if kind is None or event["kind"] == kind]
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+def export_jsonl():
+    """The buffered events plus the current counters as JSON lines."""
+    lines = [json.dumps(event, default=str) for event in events()]
+    lines.append(json.dumps({"kind": "counters", "ts": time.time(), "counters": counters()}))
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _counters.clear()
@@ -0,0 +1,69 @@
+import pandas as pd
+import streamlit as st
+
+import perf
+
+# -------------------------------
+# 🐞 Performance debug panel
+# -------------------------------
+# Optional sidebar panel summarising the instrumentation collected by perf:
+# time and memory per stage, cache hit rates and chart payload sizes.  It is
+# rendered after the page, so it includes the spans of the run that drew it.
+
+
+def span_summary(events):
+    """Calls, total / mean / max milliseconds and the last RSS delta per span name."""
+    spans = pd.DataFrame(events)
+    if spans.empty:
+        return spans
+    spans["ms"] = spans["seconds"] * 1000
+    summary = spans.groupby("name").agg(calls=("ms", "size"), total_ms=("ms", "sum"), mean_ms=("ms", "mean"),
+                                        max_ms=("ms", "max"), last_rss_delta_mb=("rss_delta", "last"))
+    summary["last_rss_delta_mb"] = summary["last_rss_delta_mb"] / (1024 * 1024)
+    return summary.sort_values("total_ms", ascending=False).round(2)
+
+
+def cache_summary(counters):
+    """Hit / miss counts and hit rate per cache, from ``<cache>.hit`` / ``<cache>.miss`` counters."""
+    rows = {}
+    for name, value in counters.items():
+        cache, _, outcome = name.rpartition(".")
+        rows.setdefault(cache or name, {})[outcome if cache else "count"] = value
+    caches = pd.DataFrame.from_dict(rows, orient="index").fillna(0).astype(int)
+    if {"hit", "miss"} <= set(caches.columns):
+        lookups = caches["hit"] + caches["miss"]
+        caches["hit_rate"] = (caches["hit"] / lookups.where(lookups > 0)).round(3)
+    return caches.sort_index()
+
+
+def payload_summary(events):
+    """Latest serialised size per chart."""
+    payloads = pd.DataFrame(events)
+    if payloads.empty:
+        return payloads
+    latest = payloads.groupby("name").last()
+    return latest.assign(kb=(latest["bytes"] / 1024).round(1))[["format", "kb"]].sort_values("kb", ascending=False)
+
+
+def render():
+    """Draw the panel in the sidebar."""
+    with st.sidebar.expander("Performance", expanded=True):
+        if not perf.ENABLED:
+            st.caption("Instrumentation is off (DASHBOARD_PERF=0).")
+            return
+        rss = perf.rss_bytes()
+        if rss is not None:
+            st.caption(f"Process RSS: {rss / (1024 * 1024):.0f} MB")
+
+        st.markdown("**Stages**")
+        st.dataframe(span_summary(perf.events("span")))
+        st.markdown("**Caches**")
+        st.dataframe(cache_summary(perf.counters()))
+        st.markdown("**Chart payloads**")
+        st.caption("Measured for charts built while this panel is open.")
+        st.dataframe(payload_summary(perf.events("payload")))
+
+        st.download_button("Export log (JSON lines)", perf.export_jsonl(), file_name="dashboard-perf.jsonl",
+                           mime="application/x-ndjson")
+        if st.button("Reset counters"):
+            perf.reset()
@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+
+import pyarrow as pa
+
+import perf
+import rollup
+
+# -------------------------------
+# 🔌 Pluggable query engine behind PreparedDataset
+# -------------------------------
+# The dashboards ask a prepared dataset two kinds of questions: "which values
+# of this column are left under these filters" (the cascading sidebar) and
+# "aggregate these measures by these keys under these filters" (the charts).
+# Both go through the engine chosen with DASHBOARD_QUERY_ENGINE:
+#
+#   pandas  (default) FilterIndex selections and the rollup cubes, with a
+#           pandas groupby fallback
+#   duckdb  SQL over the prepared frame's Arrow buffers; filters and
+#           aggregations are pushed down and run on all cores
+#
+# Row-level access (scatter plots, photos, anomaly slices) stays on the
+# FilterIndex for every engine, since it must keep the frame's row order.
+
+ENGINE = os.environ.get("DASHBOARD_QUERY_ENGINE", "pandas")
+
+logger = logging.getLogger(__name__)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+class PandasEngine:
+    name = "pandas"
+
+    def count(self, dataset, filters):
+        rows = dataset.filter_index.select(filters)
+        return len(dataset.frame) if rows is None else len(rows)
+
+    def distinct(self, dataset, column, filters):
+        index = dataset.filter_index
+        return index.options(column, index.select(filters))
+
+    def aggregate(self, dataset, cube, filters, by, measures, how="sum"):
+        return rollup.aggregate(dataset.rollups.get(cube), filters, by, measures, how, lambda: dataset.rows(filters))
+
+
+class DuckDBEngine:
+    """Runs the queries in DuckDB against an Arrow view of the prepared frame.
+
+    The Arrow table is built once per dataset version (numeric and string
+    buffers are shared with the frame, categoricals become dictionaries) and
+    every query registers it on its own cursor, so sessions query in parallel.
+    """
+
+    name = "duckdb"
+
+    def __init__(self):
+        import duckdb
+
+        self._connection = duckdb.connect(config={"threads": os.cpu_count() or 1})
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def _table(self, dataset):
+        with self._lock:
+            cached = self._tables.get(dataset.name)
+            if cached is not None and cached[0] is dataset:
+                return cached[1]
+        with perf.span("duckdb_table", dataset=dataset.name):
+            table = pa.Table.from_pandas(dataset.frame, preserve_index=False)
+        with self._lock:
+            self._tables[dataset.name] = (dataset, table)
+        return table
+
+    def _query(self, dataset, sql, params):
+        cursor = self._connection.cursor()
+        try:
+            cursor.register("dataset", self._table(dataset))
+            return cursor.execute(sql, params).df()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _where(filters, not_null=()):
+        clauses = [f"{_quote(column)} = ?" for column in filters]
+        clauses += [f"{_quote(column)} IS NOT NULL" for column in not_null]
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", list(filters.values())
+
+    def count(self, dataset, filters):
+        where, params = self._where(filters)
+        return int(self._query(dataset, f"SELECT COUNT(*) AS n FROM dataset{where}", params)["n"].iloc[0])
+
+    def distinct(self, dataset, column, filters):
+        where, params = self._where(filters, [column])
+        result = self._query(dataset, f"SELECT DISTINCT {_quote(column)} AS value FROM dataset{where} ORDER BY 1", params)
+        return result["value"].tolist()
+
+    def aggregate(self, dataset, cube, filters, by, measures, how="sum"):
+        if how == "sum":
+            # pandas sums an all-missing group to 0
+            selects = [f"COALESCE(SUM({_quote(m)}), 0) AS {_quote(m)}" for m in measures]
+        elif how == "mean":
+            selects = [f"AVG({_quote(m)}) AS {_quote(m)}" for m in measures]
+        else:
+            raise ValueError(f"Unsupported aggregation: {how}")
+        keys = ", ".join(_quote(key) for key in by)
+        # Like groupby's defaults, missing keys are dropped and the groups come back sorted
+        where, params = self._where(filters, by)
+        sql = f"SELECT {keys}, {', '.join(selects)} FROM dataset{where} GROUP BY {keys} ORDER BY {keys}"
+        return self._query(dataset, sql, params)
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+ENGINES = {"pandas": PandasEngine, "duckdb": DuckDBEngine}
+
+
+def get(name=None):
+    """The shared engine called ``name`` (default ENGINE); falls back to pandas if it can't start."""
+    name = name or ENGINE
+    with _engines_lock:
+        engine = _engines.get(name)
+        if engine is None:
+            try:
+                engine = ENGINES[name]()
+            except (KeyError, ImportError):
+                logger.warning("Query engine %r is unavailable; using pandas", name)
+                engine = _engines.get("pandas") or PandasEngine()
+            _engines[name] = engine
+        return engine
@@ -0,0 +1,280 @@
+import argparse
+import base64
+import hashlib
+import html
+import importlib.util
+import io
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import charts
+import dashboard_sleep
+import dashboard_steps
+import datasets
+import loader
+import perf
+import shared_store
+
+# -------------------------------
+# 🗂️ Offline weekly reports per organization and physician
+# -------------------------------
+# A headless batch job that writes static summaries of both dashboards:
+#
+#   load       each prepared dataset once (the published shared_store copy, or
+#              built from --source), cut to the report period
+#   aggregate  every chart's query answered for all organizations, and for all
+#              (organization, physician) pairs, with one grouped aggregation each
+#   render     one report per organization / physician in a process pool, from
+#              the same charts.Chart specs the interactive main() functions draw
+#
+#   python reports.py --output reports/ --days 7 --formats html pdf
+#
+# HTML reports embed the plotly figures (plotly.js from the CDN unless
+# --inline-js) and the matplotlib charts as PNGs.  PDF reports need kaleido
+# to rasterise the plotly figures; each chart becomes a page.
+
+DASHBOARDS = {
+    "activity": ("Activity", dashboard_steps),
+    "sleep": ("Sleep", dashboard_sleep),
+}
+
+LEVELS = {
+    "organization": ["OrganizationName"],
+    "physician": ["OrganizationName", "PhysicianName"],
+}
+
+# Headline figures at the top of each report
+SUMMARIES = {
+    "activity": charts.CubeQuery("daily", [], ["Steps", "DistanceInMeters", "Calories"]),
+    "sleep": charts.CubeQuery("daily", [], ["DurationInSeconds", "SleepEfficiency"], "mean"),
+}
+
+FORMATS = ["html", "pdf"]
+DEFAULT_DAYS = 7
+PLOTLY_CDN = '<script src="https://cdn.plot.ly/plotly-2.35.2.min.js" charset="utf-8"></script>'
+
+
+def load(names, sources=None):
+    """The prepared datasets ``names``, loaded once; ``sources`` maps a dataset to a local file or URL to build from."""
+    sources = sources or {}
+    prepared = {}
+    for name in names:
+        _, dashboard = DASHBOARDS[name]
+        with perf.span("report_load", dataset=name):
+            if name in sources:
+                prepared[name] = dashboard.build_dataset(sources[name])
+            else:
+                prepared[name] = shared_store.attach(name, dashboard.build_dataset, max_age=loader.MAX_AGE)
+        if prepared[name] is None:
+            raise RuntimeError(f"Could not load the {name} dataset")
+    return prepared
+
+
+def period(prepared, days, end=None):
+    """``(start, end)`` of the ``days`` days ending at ``end`` (default: the latest RecordDate loaded)."""
+    if end is None:
+        end = max(dataset.frame["RecordDate"].max() for dataset in prepared.values())
+    end = pd.Timestamp(end).normalize()
+    return end - pd.Timedelta(days=days - 1), end
+
+
+def window(dataset, start, end):
+    """``dataset`` restricted to RecordDate in [start, end].
+
+    Anomaly flags are sliced from the full dataset rather than recomputed, so
+    their rolling baselines still see the days before the period.
+    """
+    mask = dataset.frame["RecordDate"].between(start, end + pd.Timedelta(days=1), inclusive="left").to_numpy()
+    frame = dataset.frame[mask].reset_index(drop=True)
+    windowed = datasets.PreparedDataset(dataset.name, frame, f"{dataset.version}@{start:%Y-%m-%d}:{end:%Y-%m-%d}")
+    if "anomalies" in dataset.__dict__:
+        windowed.__dict__["anomalies"] = dataset.anomalies[mask].reset_index(drop=True)
+    return windowed
+
+
+def collect(prepared, keys):
+    """``{key: [(dataset name, chart id or None for the summary, data), ...]}`` for every ``keys`` group."""
+    reports = defaultdict(list)
+    for name, dataset in prepared.items():
+        _, dashboard = DASHBOARDS[name]
+        with perf.span("report_aggregate", dataset=name, keys=keys):
+            for key, data in SUMMARIES[name].grouped(dataset, keys):
+                reports[key].append((name, None, data))
+            for chart in dashboard.CHARTS:
+                for key, data in chart.query.grouped(dataset, keys):
+                    reports[key].append((name, chart.chart_id, data))
+    return reports
+
+
+def _slug(key):
+    # Readable part plus a short hash of the key, so keys that normalise alike ("Dr. Smith" / "Dr Smith") don't collide
+    name = "--".join(str(part) for part in key)
+    readable = re.sub(r"[^A-Za-z0-9]+", "-", name).strip("-").lower() or "unnamed"
+    return f"{readable}-{hashlib.sha1(name.encode()).hexdigest()[:8]}"
+
+
+def _chart(name, chart_id):
+    _, dashboard = DASHBOARDS[name]
+    return next(chart for chart in dashboard.CHARTS if chart.chart_id == chart_id)
+
+
+def _plotly_png(fig):
+    try:
+        return fig.to_image(format="png", width=1000, height=500)
+    except (ValueError, RuntimeError) as error:
+        raise RuntimeError("PDF reports need kaleido to rasterise the plotly charts (pip install kaleido)") from error
+
+
+def _html_report(title, sections, plotlyjs):
+    parts = [f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{html.escape(title)}</title>",
+             plotlyjs, "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}"
+             "td,th{border:1px solid #ccc;padding:4px 8px;text-align:right}</style></head><body>",
+             f"<h1>{html.escape(title)}</h1>"]
+    for heading, items in sections:
+        parts.append(f"<h2>{html.escape(heading)}</h2>")
+        for item_title, kind, body in items:
+            if item_title:
+                parts.append(f"<h3>{html.escape(item_title)}</h3>")
+            if kind == "png":
+                parts.append(f"<img src='data:image/png;base64,{base64.b64encode(body).decode()}' style='max-width:100%'>")
+            else:
+                parts.append(body)
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def _pdf_report(title, sections):
+    from PIL import Image, ImageDraw
+
+    cover = Image.new("RGB", (1000, 1414), "white")
+    draw = ImageDraw.Draw(cover)
+    lines, y = [title, ""], 40
+    for heading, items in sections:
+        lines += [heading] + [f"  {row}" for _, kind, body in items if kind == "text" for row in body] + [""]
+    for line in lines:
+        draw.text((40, y), line, fill="black")
+        y += 20
+    pages = [Image.open(io.BytesIO(body)).convert("RGB")
+             for _, items in sections for _, kind, body in items if kind == "png"]
+    out = io.BytesIO()
+    cover.save(out, format="PDF", save_all=True, append_images=pages, resolution=100)
+    return out.getvalue()
+
+
+def _html_item(kind, body):
+    if kind == "summary":
+        return body.to_frame("Value").to_html(float_format="{:,.1f}".format)
+    if kind == "figure":
+        return body.to_html(full_html=False, include_plotlyjs=False)
+    return body
+
+
+def _pdf_item(kind, body):
+    if kind == "summary":
+        return "text", [f"{col}: {value:,.1f}" for col, value in body.items()]
+    return "png", _plotly_png(body) if kind == "figure" else body
+
+
+def render(job):
+    """Write one report; runs in a pool worker.  Returns the paths written."""
+    title, items, path, formats, plotlyjs = job
+    sections = defaultdict(list)
+    for name, chart_id, data in items:
+        heading, _ = DASHBOARDS[name]
+        if chart_id is None:
+            row = data.iloc[0] if len(data) else pd.Series(dtype=float)
+            sections[heading].append(("", "summary", row))
+            continue
+        chart = _chart(name, chart_id)
+        if chart.draw is not None:
+            sections[heading].append((chart.title, "png", chart.png(data)))
+        else:
+            sections[heading].append((chart.title, "figure", chart.figure(data)))
+
+    written = []
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if "html" in formats:
+        page = [(heading, [(item_title, "png" if kind == "png" else "html", _html_item(kind, body))
+                           for item_title, kind, body in entries])
+                for heading, entries in sections.items()]
+        with open(f"{path}.html", "w", encoding="utf-8") as f:
+            f.write(_html_report(title, page, plotlyjs))
+        written.append(f"{path}.html")
+    if "pdf" in formats:
+        page = [(heading, [(item_title, *_pdf_item(kind, body)) for item_title, kind, body in entries])
+                for heading, entries in sections.items()]
+        with open(f"{path}.pdf", "wb") as f:
+            f.write(_pdf_report(title, page))
+        written.append(f"{path}.pdf")
+    return written
+
+
+def _index(output, entries, subtitle):
+    rows = "\n".join(f"<li><a href='{html.escape(os.path.relpath(path, output))}'>{html.escape(title)}</a></li>"
+                     for title, path in entries)
+    with open(os.path.join(output, "index.html"), "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Reports</title></head><body>"
+                f"<h1>Reports</h1><p>{html.escape(subtitle)}</p><ul>\n{rows}\n</ul></body></html>\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write static activity and sleep reports per organization and physician.")
+    parser.add_argument("--output", default="reports", help="directory to write the reports to (default: %(default)s)")
+    parser.add_argument("--levels", nargs="+", default=list(LEVELS), choices=list(LEVELS))
+    parser.add_argument("--dashboards", nargs="+", default=list(DASHBOARDS), choices=list(DASHBOARDS))
+    parser.add_argument("--formats", nargs="+", default=["html"], choices=FORMATS)
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS,
+                        help="report period in days, ending at --end (default: %(default)s; 0 for all data)")
+    parser.add_argument("--end", help="last day of the report period (default: the latest RecordDate)")
+    parser.add_argument("--source", action="append", default=[], metavar="DATASET=PATH",
+                        help="build a dataset from this workbook / CSV / Parquet instead of the published copy")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="render processes (default: %(default)s)")
+    parser.add_argument("--inline-js", action="store_true", help="embed plotly.js in every HTML report instead of loading it from the CDN")
+    args = parser.parse_args(argv)
+    if "pdf" in args.formats and importlib.util.find_spec("kaleido") is None:
+        parser.error("PDF reports need kaleido to rasterise the plotly charts (pip install kaleido)")
+    sources = dict(source.split("=", 1) for source in args.source)
+    if set(sources) - set(DASHBOARDS):
+        parser.error(f"--source must name one of {', '.join(DASHBOARDS)}")
+
+    started = time.perf_counter()
+    prepared = load(args.dashboards, sources)
+    subtitle = "All data"
+    if args.days > 0:
+        start, end = period(prepared, args.days, args.end)
+        prepared = {name: window(dataset, start, end) for name, dataset in prepared.items()}
+        subtitle = f"{start:%Y-%m-%d} to {end:%Y-%m-%d}"
+
+    if args.inline_js:
+        import plotly.offline
+        plotlyjs = f"<script>{plotly.offline.get_plotlyjs()}</script>"
+    else:
+        plotlyjs = PLOTLY_CDN
+
+    jobs, entries = [], []
+    for level in args.levels:
+        for key, items in sorted(collect(prepared, LEVELS[level]).items()):
+            title = f"{' / '.join(str(part) for part in key)} ({subtitle})"
+            path = os.path.join(args.output, level, _slug(key))
+            jobs.append((title, items, path, args.formats, plotlyjs))
+            entries.append((f"{level.title()}: {' / '.join(str(part) for part in key)}", path + "." + args.formats[0]))
+
+    # Spawned workers only import the chart specs; the datasets stay in this process
+    with perf.span("report_render", reports=len(jobs)):
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            written = [path for paths in pool.map(render, jobs) for path in paths]
+    os.makedirs(args.output, exist_ok=True)
+    _index(args.output, entries, subtitle)
+    print(f"wrote {len(written)} files for {len(jobs)} reports to {args.output} "
+          f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
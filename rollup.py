@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+import frames
+from filter_index import FilterIndex
+
+# -------------------------------
+# 🧊 Pre-aggregated rollup cubes for the chart aggregations
+# -------------------------------
+# A cube holds one cell per distinct combination of its key columns (typically
+# RecordDate × the organisation hierarchy) with the sum and non-null count of each
+# measure.  Charts are answered by selecting the cells that match the active
+# filters and summing them, which touches far fewer rows than regrouping the
+# raw frame.  Means are computed as sum / count, so they are exact.
+#
+# Sums only add finite values; ±inf values (e.g. SleepEfficiency when
+# TimeSpent is 0) are counted per cell instead.  That keeps every cell column
+# additive, so an incremental update can subtract removed rows exactly (inf -
+# inf would leave a NaN behind), and a query puts the infinities back the way
+# pandas' own sum would.
+
+
+class RollupCube:
+    def __init__(self, frame, keys, measures):
+        self.keys = [key for key in keys if key in frame.columns]
+        self.measures = list(measures)
+        self.cells = self._cells(frame)
+        self.index = FilterIndex(self.cells, self.keys)
+
+    def _cells(self, frame):
+        columns = {}
+        for measure in self.measures:
+            values = frame[measure]
+            if pd.api.types.is_float_dtype(values.dtype):
+                numbers = values.to_numpy(dtype=float, na_value=np.nan)
+                columns[measure] = np.where(np.isfinite(numbers), numbers, 0.0)
+                columns[measure + "__posinf"] = (numbers == np.inf).astype(np.int64)
+                columns[measure + "__neginf"] = (numbers == -np.inf).astype(np.int64)
+            else:
+                columns[measure] = values.to_numpy()
+                columns[measure + "__posinf"] = columns[measure + "__neginf"] = np.zeros(len(frame), dtype=np.int64)
+            columns[measure + "__count"] = values.notna().to_numpy().astype(np.int64)
+        table = pd.DataFrame(columns, index=frame.index)
+        grouped = table.groupby([frame[key] for key in self.keys], observed=True, dropna=False, sort=False)
+        return grouped.sum().assign(__rows=grouped.size()).reset_index()
+
+    def updated(self, removed, delta):
+        """A new cube with the ``removed`` rows subtracted and the ``delta`` rows added.
+
+        Only the changed rows are grouped; the existing cells are merged with
+        the delta cells, and cells left without rows are dropped.
+        """
+        parts = [self.cells, self._cells(delta)]
+        if len(removed):
+            negated = self._cells(removed)
+            value_cols = [col for col in negated.columns if col not in self.keys]
+            negated[value_cols] = -negated[value_cols]
+            parts.append(negated)
+        merged = (frames.concat_frames(parts)
+                  .groupby(self.keys, observed=True, dropna=False, sort=False).sum()
+                  .reset_index())
+        cube = RollupCube.__new__(RollupCube)
+        cube.keys, cube.measures = self.keys, self.measures
+        cube.cells = merged[merged["__rows"] > 0].reset_index(drop=True)
+        cube.index = FilterIndex(cube.cells, cube.keys)
+        return cube
+
+    def covers(self, columns):
+        """True when every column in ``columns`` is a key of this cube."""
+        return set(columns) <= set(self.keys)
+
+    def query(self, filters, by, measures, how="sum"):
+        """Aggregate ``measures`` by ``by`` over the cells matching ``filters``.
+
+        ``how`` is ``"sum"`` or ``"mean"``; the result matches
+        ``raw.groupby(by)[measures].<how>().reset_index()`` on the filtered rows.
+        """
+        cells = self.index.take(self.cells, self.index.select(filters))
+        count_cols = [measure + "__count" for measure in measures]
+        posinf_cols = [measure + "__posinf" for measure in measures]
+        neginf_cols = [measure + "__neginf" for measure in measures]
+        totals = cells.groupby(by, observed=True)[measures + count_cols + posinf_cols + neginf_cols].sum()
+        result = totals[measures]
+        for measure in measures:
+            posinf, neginf = totals[measure + "__posinf"] > 0, totals[measure + "__neginf"] > 0
+            if posinf.any() or neginf.any():
+                # inf + -inf is NaN, as in a plain sum over the rows
+                result = result.assign(**{measure: result[measure] + np.where(posinf, np.inf, 0.0)
+                                          + np.where(neginf, -np.inf, 0.0)})
+        if how == "mean":
+            result = result / totals[count_cols].to_numpy()
+        elif how != "sum":
+            raise ValueError(f"Unsupported aggregation: {how}")
+        return result.reset_index()
+
+
+def aggregate(cube, filters, by, measures, how, rows):
+    """Answer a chart aggregation from ``cube`` when it can, else from the raw filtered ``rows``.
+
+    Falls back to the raw rows when a filter or group-by column is not a key of
+    the cube (e.g. a single participant is selected).  ``rows`` is the filtered
+    frame or a callable returning it, so it is only materialised when needed.
+    """
+    if cube is not None and cube.covers(list(filters) + list(by)):
+        return cube.query(filters, by, measures, how)
+    if callable(rows):
+        rows = rows()
+    grouped = rows.groupby(by, observed=True)[measures]
+    if how == "sum":
+        return grouped.sum().reset_index()
+    if how == "mean":
+        return grouped.mean().reset_index()
+    raise ValueError(f"Unsupported aggregation: {how}")
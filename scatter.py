@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# -------------------------------
+# 🔬 Large scatter plots with a bounded payload
+# -------------------------------
+# Row-level scatter plots are serialised point by point to the browser.  Above
+# the point budget they are either density-sampled (every occupied region of
+# the plot keeps at least one point, dense regions are thinned in proportion)
+# or aggregated server-side into a 2-D histogram, so the payload grows with
+# the budget instead of the row count.  Points are drawn with WebGL.
+
+SCATTER_POINT_BUDGET = int(os.environ.get("SCATTER_POINT_BUDGET", 5000))
+HEATMAP_BINS = 60
+
+MODES = ["Sampled points", "Density heatmap"]
+
+
+def density_sample(df, x, y, budget=SCATTER_POINT_BUDGET, seed=0):
+    """Return at most about ``budget`` rows of ``df`` that preserve the x/y density.
+
+    The plane is split into a grid; each occupied cell keeps a share of its
+    rows proportional to its population, and never fewer than one, so sparse
+    outliers survive.  The result is deterministic for a given ``seed``.
+    """
+    df = _finite(df, x, y)
+    n = len(df)
+    if n <= budget:
+        return df
+    # Roughly budget / 4 cells, so the one-point minimum cannot blow the budget up
+    bins = max(1, int(np.sqrt(budget / 4)))
+    cell = _bin_codes(df[x].to_numpy(dtype=float), bins) * bins + _bin_codes(df[y].to_numpy(dtype=float), bins)
+    counts = np.bincount(cell, minlength=bins * bins)
+    quota = np.maximum(1, np.floor(counts * (budget / n))).astype(np.int64)
+
+    order = np.random.default_rng(seed).permutation(n)
+    shuffled_cells = cell[order]
+    rank = pd.Series(shuffled_cells).groupby(shuffled_cells).cumcount().to_numpy()
+    keep = np.sort(order[rank < quota[shuffled_cells]])
+    return df.iloc[keep]
+
+
+def _finite(df, x, y):
+    # NaN and ±inf (e.g. SleepEfficiency when TimeSpent is 0) cannot be binned
+    keep = np.isfinite(df[x].to_numpy(dtype=float)) & np.isfinite(df[y].to_numpy(dtype=float))
+    return df if keep.all() else df[keep]
+
+
+def _bin_codes(values, bins):
+    lo, hi = values.min(), values.max()
+    if hi == lo:
+        return np.zeros(len(values), dtype=np.int64)
+    return np.minimum(((values - lo) / (hi - lo) * bins).astype(np.int64), bins - 1)
+
+
+def scatter_figure(df, x, y, title, labels, color=None, opacity=0.7, mode=MODES[0], budget=SCATTER_POINT_BUDGET):
+    """Plotly scatter of ``df`` whose payload is bounded by ``budget`` points."""
+    total = len(df)
+    if mode == MODES[1] and total > budget:
+        return _density_heatmap(df, x, y, title, labels)
+
+    sample = density_sample(df, x, y, budget)
+    if len(sample) < total:
+        title = f"{title} (showing {len(sample):,} of {total:,} points)"
+    columns = [x, y] + ([color] if color else [])
+    return px.scatter(sample[columns], x=x, y=y, color=color, title=title, labels=labels, opacity=opacity,
+                      render_mode="webgl")
+
+
+def _density_heatmap(df, x, y, title, labels):
+    valid = _finite(df, x, y)
+    counts, x_edges, y_edges = np.histogram2d(valid[x].to_numpy(dtype=float), valid[y].to_numpy(dtype=float),
+                                              bins=HEATMAP_BINS)
+    fig = go.Figure(go.Heatmap(x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+                               z=np.where(counts.T > 0, counts.T, np.nan), colorscale="Blues",
+                               colorbar={"title": "Rows"}))
+    fig.update_layout(title=f"{title} ({len(valid):,} points binned)",
+                      xaxis_title=labels.get(x, x), yaxis_title=labels.get(y, y))
+    return fig
@@ -0,0 +1,212 @@
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+import datasets
+import perf
+from datasets import PreparedDataset
+
+# -------------------------------
+# 🤝 Prepared datasets shared across worker processes
+# -------------------------------
+# One worker builds a prepared dataset and publishes it as an Arrow IPC file
+# (on /dev/shm when available).  Every worker memory-maps the same file, so the
+# column buffers live once in the page cache instead of once per process.
+# Numeric and string columns are mapped without copying; only small pieces
+# such as categorical codes are materialised per process.
+#
+# Each dataset has a pointer file ``<name>.current`` holding the current
+# version counter.  A refresh writes ``<name>.v<N>.arrow`` and then swaps the
+# pointer with an atomic rename, so a worker sees either the old or the new
+# version, never a partial one.  An exclusive file lock makes sure only one
+# worker rebuilds at a time; the others keep serving the version they have.
+
+STORE_DIR = os.environ.get(
+    "DASHBOARD_SHARED_DIR",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "altascio-datasets"),
+)
+KEEP_VERSIONS = 2
+
+_attached = {}
+_attached_lock = threading.Lock()
+
+
+def _pointer_path(name):
+    return os.path.join(STORE_DIR, f"{name}.current")
+
+
+def _data_path(name, version, part=None):
+    suffix = f".{part}" if part else ""
+    return os.path.join(STORE_DIR, f"{name}.v{version}{suffix}.arrow")
+
+
+def _write_arrow(path, frame):
+    # One chunk per column: multi-chunk columns cannot be mapped zero-copy by to_pandas()
+    table = pa.Table.from_pandas(frame, preserve_index=False).combine_chunks()
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def _read_arrow(path):
+    table = ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def read_pointer(name):
+    """The current ``{"version", "source_version", "format", "published_at"}`` of ``name``, or ``None``."""
+    try:
+        with open(_pointer_path(name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publish(name, dataset):
+    """Write ``dataset`` as the next version of ``name`` and make it current.
+
+    Row-aligned derived frames that have already been computed (such as the
+    anomaly flags) are published alongside it, so other workers map them
+    instead of recomputing them.
+    """
+    os.makedirs(STORE_DIR, exist_ok=True)
+    pointer = read_pointer(name)
+    version = (pointer["version"] if pointer else 0) + 1
+
+    _write_arrow(_data_path(name, version), dataset.frame)
+    parts = [part for part, value in dataset.derived().items() if isinstance(value, pd.DataFrame)]
+    for part in parts:
+        _write_arrow(_data_path(name, version, part), getattr(dataset, part))
+
+    pointer = _write_pointer(name, {"version": version, "source_version": dataset.version,
+                                    "format": datasets.FORMAT_VERSION, "parts": parts})
+
+    # Workers that still map an older file keep their pages until they let go of it
+    for old in range(version - KEEP_VERSIONS, 0, -1):
+        paths = glob.glob(os.path.join(STORE_DIR, f"{name}.v{old}.*arrow")) + [_data_path(name, old)]
+        paths = [path for path in dict.fromkeys(paths) if os.path.exists(path)]
+        if not paths:
+            break
+        for path in paths:
+            os.remove(path)
+    return pointer
+
+
+def _write_pointer(name, pointer):
+    pointer = dict(pointer, published_at=time.time())
+    fd, tmp_pointer = tempfile.mkstemp(dir=STORE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(pointer, f)
+    os.replace(tmp_pointer, _pointer_path(name))
+    return pointer
+
+
+def _map(name, pointer, built=None):
+    frame = _read_arrow(_data_path(name, pointer["version"]))
+    dataset = PreparedDataset(name, frame, pointer["source_version"])
+    for part in pointer.get("parts", []):
+        dataset.__dict__[part] = _read_arrow(_data_path(name, pointer["version"], part))
+    if built is not None:
+        # Same rows in the same order, so the builder's index and rollups apply to the mapped frame
+        dataset.__dict__.update(built.derived())
+    return dataset
+
+
+def current(name):
+    """The currently published version of ``name``, or ``None`` if there is no usable one."""
+    pointer = read_pointer(name)
+    if pointer is None or pointer.get("format") != datasets.FORMAT_VERSION:
+        return None
+    return _attach(name, pointer)
+
+
+def _attach(name, pointer, built=None):
+    with _attached_lock:
+        attached = _attached.get(name)
+        if attached is not None and attached[0] == pointer["version"]:
+            perf.hit("shared_store", True)
+            return attached[1]
+    perf.hit("shared_store", False)
+    with perf.span("attach", dataset=name):
+        dataset = _map(name, pointer, built)
+    with _attached_lock:
+        _attached[name] = (pointer["version"], dataset)
+    return dataset
+
+
+def attached_version(name):
+    """The published version this process currently has mapped for ``name``, or ``None``."""
+    with _attached_lock:
+        attached = _attached.get(name)
+    return attached[0] if attached else None
+
+
+@contextmanager
+def _build_lock(name, blocking):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    with open(os.path.join(STORE_DIR, f"{name}.lock"), "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _is_stale(pointer, max_age):
+    if pointer is None or pointer.get("format") != datasets.FORMAT_VERSION:
+        return True
+    return max_age is not None and time.time() - pointer["published_at"] > max_age
+
+
+def needs_refresh(name, max_age):
+    """True when ``name`` has no usable published version or it is older than ``max_age`` seconds."""
+    return _is_stale(read_pointer(name), max_age)
+
+
+def attach(name, build, max_age=None):
+    """The current shared version of ``name``, building and publishing it when needed.
+
+    ``build()`` returns a ``PreparedDataset`` (or ``None`` on failure) and is
+    only called by the one worker that holds the build lock, when no version
+    exists yet or the current one is older than ``max_age`` seconds.  It may
+    return ``current(name)`` unchanged, in which case nothing is republished.
+    Workers that find a rebuild already in progress keep serving the current
+    version.  Re-attaching is cheap: the process keeps its mapping until the
+    pointer moves.
+    """
+    pointer = read_pointer(name)
+    built = None
+    if _is_stale(pointer, max_age):
+        # Without a usable published version there is nothing to serve, so wait for the builder
+        usable = pointer is not None and pointer.get("format") == datasets.FORMAT_VERSION
+        with _build_lock(name, blocking=not usable) as acquired:
+            if acquired:
+                pointer = read_pointer(name)
+                if _is_stale(pointer, max_age):
+                    previous = current(name)
+                    with perf.span("build", dataset=name):
+                        built = build()
+                    if built is not None and built is previous:
+                        # Nothing changed upstream; just restart the refresh clock
+                        pointer = _write_pointer(name, pointer)
+                    elif built is not None:
+                        with perf.span("publish", dataset=name):
+                            pointer = publish(name, built)
+        if pointer is None or pointer.get("format") != datasets.FORMAT_VERSION:
+            return None
+
+    return _attach(name, pointer, built)
@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The dashboards are flat top-level modules; make them importable from the tests
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class HTTPStub:
+    """A local HTTP server standing in for S3: ``routes`` maps a path to ``(body, headers)``.
+
+    Every request is recorded in ``requests`` as ``(method, path)``; ``delay``
+    holds GET responses back so concurrent callers overlap.  No headers are
+    sent besides the route's own, so a route without ETag / Last-Modified /
+    Content-Length carries no validator at all.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.delay = 0.0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                stub.requests.append(("HEAD", self.path))
+                self._respond(body=False)
+
+            def do_GET(self):
+                stub.requests.append(("GET", self.path))
+                time.sleep(stub.delay)
+                self._respond(body=True)
+
+            def _respond(self, body):
+                if self.path not in stub.routes:
+                    self.send_error(404)
+                    return
+                content, headers = stub.routes[self.path]
+                self.send_response(200)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if body:
+                    self.wfile.write(content)
+
+            def send_response(self, code, message=None):
+                # Skip the default Server / Date headers
+                self.send_response_only(code, message)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def gets(self, path):
+        return self.requests.count(("GET", path))
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def http_stub():
+    stub = HTTPStub()
+    yield stub
+    stub.stop()
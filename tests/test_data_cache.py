@@ -0,0 +1,61 @@
+import io
+
+import pandas as pd
+import pytest
+
+import data_cache
+
+# Revalidation of the Parquet cache against a local HTTP stub (tests/conftest.py)
+
+INGEST = {"numeric": ["Steps"], "dates": ["RecordDate"]}
+
+
+def _workbook(steps):
+    frame = pd.DataFrame({"RecordDate": pd.date_range("2024-01-01", periods=len(steps)), "Steps": steps,
+                          "FirstName": [f"First{i}" for i in range(len(steps))]})
+    out = io.BytesIO()
+    frame.to_excel(out, index=False, engine="openpyxl")
+    return out.getvalue()
+
+
+def _load(http_stub, tmp_path):
+    return data_cache.load_excel_cached(http_stub.url("/data.xlsx"), cache_dir=str(tmp_path), **INGEST)
+
+
+def test_etag_revalidation(http_stub, tmp_path):
+    http_stub.routes["/data.xlsx"] = (_workbook([1, 2, 3]), {"ETag": '"v1"'})
+    first = _load(http_stub, tmp_path)
+    assert first["Steps"].tolist() == [1, 2, 3]
+    assert first.attrs["source_version"] == '"v1"'
+
+    # Same ETag: served from the cache without downloading
+    _load(http_stub, tmp_path)
+    assert http_stub.gets("/data.xlsx") == 1
+
+    http_stub.routes["/data.xlsx"] = (_workbook([4, 5]), {"ETag": '"v2"'})
+    second = _load(http_stub, tmp_path)
+    assert http_stub.gets("/data.xlsx") == 2
+    assert second["Steps"].tolist() == [4, 5]
+    assert second.attrs["source_version"] == '"v2"'
+
+
+def test_no_validator_headers_reingests(http_stub, tmp_path):
+    http_stub.routes["/data.xlsx"] = (_workbook([1, 2, 3]), {})
+    _load(http_stub, tmp_path)
+    http_stub.routes["/data.xlsx"] = (_workbook([7]), {})
+    # Nothing proves the cached copy current, so every load downloads again
+    assert _load(http_stub, tmp_path)["Steps"].tolist() == [7]
+    assert http_stub.gets("/data.xlsx") == 2
+
+
+def test_unreachable_source_serves_cached_copy(http_stub, tmp_path):
+    http_stub.routes["/data.xlsx"] = (_workbook([1, 2, 3]), {"ETag": '"v1"'})
+    source = http_stub.url("/data.xlsx")
+    _load(http_stub, tmp_path)
+    http_stub.stop()
+
+    cached = data_cache.load_excel_cached(source, cache_dir=str(tmp_path), **INGEST)
+    assert cached["Steps"].tolist() == [1, 2, 3]
+    assert cached.attrs["source_version"] == '"v1"'
+    with pytest.raises(OSError):
+        data_cache.load_excel_cached(source, cache_dir=str(tmp_path / "empty"), **INGEST)
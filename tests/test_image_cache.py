@@ -0,0 +1,95 @@
+import io
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import image_cache
+
+# Photo thumbnails fetched from a local HTTP stub (tests/conftest.py)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_cache, "CACHE_DIR", str(tmp_path / "images"))
+    monkeypatch.setattr(image_cache, "_memory", image_cache.OrderedDict())
+    monkeypatch.setattr(image_cache, "_memory_bytes", 0)
+    monkeypatch.setattr(image_cache, "_failures", {})
+
+
+def _photo(size=(600, 400), mode="RGB", seed=0):
+    image = Image.effect_noise(size, 60 + seed).convert(mode)
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_concurrent_callers_share_one_fetch(http_stub):
+    http_stub.routes["/a.png"] = (_photo(), {})
+    http_stub.delay = 0.3
+    url = http_stub.url("/a.png")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(image_cache.thumbnail(url))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert http_stub.gets("/a.png") == 1
+    assert len(results) == 8 and results[0] and all(result == results[0] for result in results)
+
+
+def test_thumbnail_is_resized(http_stub):
+    http_stub.routes["/a.png"] = (_photo((600, 400)), {})
+    http_stub.routes["/alpha.png"] = (_photo((300, 600), mode="RGBA"), {})
+    photos = image_cache.thumbnails([http_stub.url("/a.png"), http_stub.url("/alpha.png")])
+    with Image.open(io.BytesIO(photos[http_stub.url("/a.png")])) as image:
+        assert (image.size, image.format) == ((150, 100), "JPEG")
+    with Image.open(io.BytesIO(photos[http_stub.url("/alpha.png")])) as image:
+        assert (image.size, image.format) == ((150, 300), "PNG")
+
+
+def test_memory_and_disk_lru_eviction(http_stub, monkeypatch):
+    paths = ["/a.png", "/b.png", "/c.png"]
+    for path in paths:
+        http_stub.routes[path] = (_photo(), {})
+    size = len(image_cache.thumbnail(http_stub.url(paths[0])))
+    # Room for two thumbnails in memory and on disk
+    monkeypatch.setattr(image_cache, "MAX_MEMORY_BYTES", int(size * 2.5))
+    monkeypatch.setattr(image_cache, "MAX_DISK_BYTES", int(size * 2.5))
+    for path in paths[1:]:
+        time.sleep(0.01)  # distinct mtimes for the disk LRU
+        image_cache.thumbnail(http_stub.url(path))
+
+    keys = [image_cache._key(http_stub.url(path), image_cache.THUMBNAIL_WIDTH) for path in paths]
+    assert list(image_cache._memory) == keys[1:]
+    assert image_cache._disk_get(keys[0]) is None
+    assert image_cache._disk_get(keys[1]) is not None
+
+    # Evicted from memory but still on disk: no new download
+    image_cache._memory.clear()
+    image_cache.thumbnail(http_stub.url(paths[2]))
+    assert http_stub.gets(paths[2]) == 1
+    # Evicted from both: downloaded again
+    image_cache.thumbnail(http_stub.url(paths[0]))
+    assert http_stub.gets(paths[0]) == 2
+
+
+def test_failures_are_remembered_for_the_ttl(http_stub, monkeypatch):
+    url = http_stub.url("/missing.png")
+    assert image_cache.thumbnail(url) is None
+    http_stub.routes["/missing.png"] = (_photo(), {})
+    # Within the TTL the dead link isn't retried
+    assert image_cache.thumbnail(url) is None
+    assert http_stub.gets("/missing.png") == 1
+
+    monkeypatch.setattr(image_cache, "FAILURE_TTL", 0)
+    assert image_cache.thumbnail(url) is not None
+    assert http_stub.gets("/missing.png") == 2
+
+
+@pytest.mark.parametrize("url", ["file:///etc/passwd", "/etc/passwd", "ftp://example.com/a.png"])
+def test_non_http_urls_are_refused(url):
+    with pytest.raises(ValueError):
+        image_cache._fetch(url)
+    assert image_cache.thumbnail(url) is None
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmark
+import data_cache
+import datasets
+import incremental
+
+# Incremental refresh against successive local workbook snapshots: a dataset
+# built from the previous snapshot (with every derived structure already
+# built) is brought up to date with the next one, and must match a full
+# rebuild from that snapshot — frame, filter index, rollup cubes, anomaly
+# flags and participant series.
+
+ROWS = 900  # 10 participants x 90 days
+PREPARE = {"activity": datasets.prepare_activity, "sleep": datasets.prepare_sleep}
+CHANGED_MEASURE = {"activity": "Steps", "sleep": "DeepSleep"}
+
+
+def _base(name):
+    raw = benchmark.SYNTHETIC[name](ROWS)
+    # Plain object columns so snapshots can introduce new categories
+    return raw.astype({col: object for col in raw.columns if isinstance(raw[col].dtype, pd.CategoricalDtype)})
+
+
+def _append(name, raw):
+    return raw[raw["RecordDate"] < "2024-03-01"], raw
+
+
+def _change(name, raw):
+    changed = raw.copy()
+    measure = CHANGED_MEASURE[name]
+    changed.loc[changed.index[[3, 250, 251, 700]], measure] = changed[measure].max() * 5
+    return raw, changed
+
+
+def _remove(name, raw):
+    first_participant = raw.index[(raw["FirstName"] == raw["FirstName"].iloc[0]).to_numpy()]
+    drop = first_participant[-5:].append(raw.index[[400]])
+    return raw, raw.drop(drop)
+
+
+def _new_category(name, raw):
+    newcomer = raw.iloc[:30].copy()
+    newcomer["FirstName"] = "Newcomer"
+    newcomer["OrganizationName"] = "Brand New Org"
+    newcomer["PhysicianName"] = "Dr. Brand New"
+    newcomer["City"] = "New City"
+    return raw, pd.concat([raw, newcomer], ignore_index=True)
+
+
+def _nonfinite(name, raw):
+    # TimeSpent 0 makes SleepEfficiency inf; the next snapshot corrects it
+    broken = raw.copy()
+    broken.loc[broken.index[[3, 4, 500]], "TimeSpent"] = 0
+    return broken, raw
+
+
+SCENARIOS = {"append": _append, "change": _change, "remove": _remove, "new_category": _new_category}
+
+
+def _snapshot(tmp_path, name, label, raw):
+    path = tmp_path / f"{name}-{label}.xlsx"
+    raw.to_excel(path, index=False, engine="openpyxl")
+    return data_cache.load_excel_cached(str(path), cache_dir=str(tmp_path / "cache"), **datasets.INGEST[name])
+
+
+def _by_row(frame, dataset):
+    """``frame`` (aligned with ``dataset.frame``) in RowHash order, so both builds compare row for row."""
+    order = np.argsort(dataset.frame["RowHash"].to_numpy(), kind="stable")
+    return frame.iloc[order].reset_index(drop=True)
+
+
+def _sorted(frame, by):
+    return frame.sort_values(by, ignore_index=True)
+
+
+def _check(tmp_path, name, before, after):
+    previous = PREPARE[name](_snapshot(tmp_path, name, "before", before))
+    previous.filter_index, previous.rollups, previous.participant_series
+    if name == "activity":
+        previous.anomalies
+
+    raw = _snapshot(tmp_path, name, "after", after)
+    updated = incremental.refresh(previous, raw, PREPARE[name])
+    full = PREPARE[name](raw)
+
+    # Updated from the changed rows, not rebuilt
+    assert updated is not previous
+    assert {"filter_index", "rollups", "participant_series"} <= set(updated.__dict__)
+
+    pd.testing.assert_frame_equal(_by_row(updated.frame, updated), _by_row(full.frame, full),
+                                  check_categorical=False)
+
+    for column in datasets.FILTER_COLS:
+        assert updated.filter_index.options(column) == full.filter_index.options(column), column
+    selections = [{}] + [{"OrganizationName": org} for org in full.filter_index.options("OrganizationName")]
+    for filters in selections:
+        assert updated.count(filters) == full.count(filters), filters
+        assert updated.distinct("PhysicianName", filters) == full.distinct("PhysicianName", filters)
+
+    for cube, (keys, measures) in datasets.ROLLUPS[name].items():
+        for by in ([keys[0]], ["OrganizationName", "PhysicianName"]):
+            for how in ("sum", "mean"):
+                for filters in selections[:2]:
+                    pd.testing.assert_frame_equal(
+                        _sorted(updated.aggregate(cube, filters, by, measures, how), by),
+                        _sorted(full.aggregate(cube, filters, by, measures, how), by),
+                        check_categorical=False, check_dtype=False)
+
+    pd.testing.assert_frame_equal(updated.participant_series, full.participant_series,
+                                  check_categorical=False, check_dtype=False)
+
+    if name == "activity":
+        assert "anomalies" in updated.__dict__
+        pd.testing.assert_frame_equal(_by_row(updated.anomalies, updated), _by_row(full.anomalies, full))
+
+
+@pytest.mark.parametrize("scenario", list(SCENARIOS))
+@pytest.mark.parametrize("name", list(PREPARE))
+def test_incremental_matches_full_rebuild(tmp_path, name, scenario):
+    _check(tmp_path, name, *SCENARIOS[scenario](name, _base(name)))
+
+
+def test_nonfinite_measures_corrected(tmp_path):
+    before, after = _nonfinite("sleep", _base("sleep"))
+    _check(tmp_path, "sleep", before, after)
+    # ...and back again: rows with inf added to the cubes
+    _check(tmp_path, "sleep", after, before)
+
+
+def test_duplicate_multiplicity_change(tmp_path):
+    # [a, a, b] -> [a, b, b]: same rows and row count, different copies
+    raw = _base("sleep")
+    before = pd.concat([raw, raw.iloc[[0]]], ignore_index=True)
+    after = pd.concat([raw, raw.iloc[[1]]], ignore_index=True)
+    previous = datasets.prepare_sleep(_snapshot(tmp_path, "sleep", "before", before))
+    raw_after = _snapshot(tmp_path, "sleep", "after", after)
+    updated = incremental.refresh(previous, raw_after, datasets.prepare_sleep)
+    full = datasets.prepare_sleep(raw_after)
+    pd.testing.assert_frame_equal(_by_row(updated.frame, updated), _by_row(full.frame, full),
+                                  check_categorical=False)